@@ -0,0 +1,239 @@
+"""
+Batch poster generator.
+
+Renders every row of a job manifest (CSV, JSON or YAML). Rows that share
+a location and radius are grouped so their map data is fetched once, then
+rendering fans out over a process pool. Per-job results, timings and
+failures are written to a JSON summary.
+
+Usage:
+  python batch_posters.py jobs.csv [--workers N] [--summary batch_summary.json]
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import create_map_poster as cmp
+from geocoding import place_key
+
+# Manifest columns and their defaults; city and country are required
+JOB_DEFAULTS = {
+    "theme": "feature_based",
+    "distance": 29000,
+    "width": 12.0,
+    "height": 16.0,
+    "format": "png",
+    "dpi": cmp.DPI,
+    "layout": cmp.LAYOUT,
+    "country_label": None,
+    "name_label": None,
+    "output": None,
+}
+
+JOB_TYPES = {"distance": int, "width": float, "height": float, "dpi": int}
+
+
+def load_manifest(path):
+    """
+    Reads job rows from a CSV, JSON or YAML manifest.
+    JSON and YAML manifests hold a list of rows, or {"jobs": [...]}.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, "r", newline="") as f:
+        if ext == ".csv":
+            rows = list(csv.DictReader(f))
+        elif ext == ".json":
+            rows = json.load(f)
+        elif ext in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("YAML manifests need PyYAML: pip install pyyaml")
+            rows = yaml.safe_load(f)
+        else:
+            raise ValueError(f"Unsupported manifest format '{ext}' (use .csv, .json or .yaml)")
+
+    if isinstance(rows, dict):
+        rows = rows.get("jobs", [])
+    return [normalize_job(row, i) for i, row in enumerate(rows)]
+
+
+def normalize_job(row, index):
+    """
+    Fills in defaults and converts manifest values to their types.
+    """
+    job = dict(JOB_DEFAULTS)
+    job.update({k: v for k, v in row.items() if v not in (None, "")})
+    if not job.get("city") or not job.get("country"):
+        raise ValueError(f"Job {index}: city and country are required")
+    for key, cast in JOB_TYPES.items():
+        job[key] = cast(job[key])
+    job["format"] = job["format"].lower()
+    if job["format"] not in ("png", "svg", "pdf"):
+        raise ValueError(f"Job {index}: unsupported format '{job['format']}'")
+    if job["layout"] not in cmp.LAYOUTS:
+        raise ValueError(f"Job {index}: unsupported layout '{job['layout']}'")
+    job["index"] = index
+    return job
+
+
+def batch_output_filename(job, output_dir):
+    """
+    Output path for a job without an explicit output. Unlike
+    generate_output_filename() it is unique per size and distance, since
+    many jobs of one batch finish within the same second.
+    """
+    city_slug = job["city"].lower().replace(" ", "_")
+    size = f"{job['width']:g}x{job['height']:g}"
+    return os.path.join(output_dir, f"{city_slug}_{job['theme']}_{job['distance']}m_{size}.{job['format']}")
+
+
+def group_jobs(jobs):
+    """
+    Groups jobs by location and radius, the data they share. Spelling
+    variants of a place ("New York, USA" / "new york, United States")
+    fall into one group.
+    """
+    groups = {}
+    for job in jobs:
+        key = (place_key(job["city"], job["country"]), job["distance"])
+        groups.setdefault(key, []).append(job)
+    return groups
+
+
+def prefetch_group(jobs, point):
+    """
+    Fetches the map data of a group once, so the render workers only
+    read from the cache.
+    """
+    # Jobs with another aspect ratio need a different radius; tiles are shared
+    for dist in sorted({cmp.get_compensated_dist(job["distance"], job["width"], job["height"]) for job in jobs}):
+        cmp.fetch_scene_data(point, dist)
+
+
+def render_job(job, point):
+    """
+    Renders one job in a worker process and reports how it went.
+    """
+    started = time.perf_counter()
+    try:
+        theme = cmp.load_theme(job["theme"])
+        cmp.create_poster(
+            job["city"], job["country"], point, job["distance"], job["output"], job["format"],
+            job["width"], job["height"], country_label=job["country_label"], name_label=job["name_label"], theme=theme, dpi=job["dpi"],
+            layout=job["layout"],
+        )
+        return {"status": "ok", "output": job["output"], "bytes": os.path.getsize(job["output"]),
+                "seconds": round(time.perf_counter() - started, 3)}
+    except Exception as e:
+        return {"status": "failed", "error": str(e), "traceback": traceback.format_exc(),
+                "seconds": round(time.perf_counter() - started, 3)}
+
+
+def run_batch(jobs, workers=None, output_dir=cmp.POSTERS_DIR, summary_path=None):
+    """
+    Runs a batch of jobs and returns the summary dict.
+    """
+    started = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    available_themes = set(cmp.get_available_themes())
+    results = {}
+
+    # 1. Geocode every place once, known places straight from the gazetteer
+    places = cmp.get_geocoder().resolve_many([(job["city"], job["country"]) for job in jobs])
+
+    # 2. Fetch data once per group, in this process (rate limits are per process)
+    points = {}
+    for key, group in group_jobs(jobs).items():
+        print(f"\nPreparing data for {group[0]['city']}, {group[0]['country']} ({key[1]} m, {len(group)} jobs)")
+        fetch_started = time.perf_counter()
+        try:
+            point = places[(group[0]["city"], group[0]["country"])]
+            if isinstance(point, Exception):
+                raise point
+            prefetch_group(group, point)
+        except Exception as e:
+            print(f"✗ {e}")
+            for job in group:
+                results[job["index"]] = {"status": "failed", "error": f"Data fetch failed: {e}"}
+            continue
+        fetch_seconds = round(time.perf_counter() - fetch_started, 3)
+        for job in group:
+            points[job["index"]] = point
+            results[job["index"]] = {"fetch_seconds": fetch_seconds}
+
+    # 3. Render in parallel
+    runnable = []
+    for job in jobs:
+        if job["index"] not in points:
+            continue
+        if job["theme"] not in available_themes:
+            results[job["index"]] = {"status": "failed", "error": f"Theme '{job['theme']}' not found"}
+            continue
+        job["output"] = job["output"] or batch_output_filename(job, output_dir)
+        runnable.append(job)
+
+    workers = workers or os.cpu_count() or 1
+    print(f"\nRendering {len(runnable)} posters on {workers} workers...")
+    # spawn: the parent has run fetch threads, which fork does not copy safely
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {pool.submit(render_job, job, points[job["index"]]): job for job in runnable}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:  # worker crashed
+                result = {"status": "failed", "error": str(e)}
+            results[job["index"]].update(result)
+            mark = "✓" if result["status"] == "ok" else "✗"
+            print(f"{mark} [{job['index']}] {job['city']} / {job['theme']}: {result.get('output', result.get('error'))}")
+
+    summary = {
+        "jobs": [
+            dict({k: job[k] for k in ("index", "city", "country", "theme", "distance", "width", "height", "format")},
+                 **results[job["index"]])
+            for job in jobs
+        ],
+        "succeeded": sum(1 for r in results.values() if r.get("status") == "ok"),
+        "failed": sum(1 for r in results.values() if r.get("status") != "ok"),
+        "workers": workers,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    if summary_path:
+        with open(summary_path, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"\nSummary written to {summary_path}")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render a batch of map posters from a manifest")
+    parser.add_argument("manifest", help="CSV, JSON or YAML file with city, country, theme, distance, width, height, format rows")
+    parser.add_argument("--workers", "-j", type=int, help="Render processes (default: number of CPU cores)")
+    parser.add_argument("--output-dir", "-o", default=cmp.POSTERS_DIR, help=f"Directory for posters (default: {cmp.POSTERS_DIR})")
+    parser.add_argument("--summary", default="batch_summary.json", help="Summary file (default: batch_summary.json)")
+    parser.add_argument("--osm-file", help="Read map data from a local OSM extract instead of Overpass")
+    args = parser.parse_args()
+
+    if args.osm_file:
+        if not os.path.exists(args.osm_file):
+            print(f"Error: OSM extract '{args.osm_file}' not found.")
+            sys.exit(1)
+        # Exported to the environment, so the render processes read it too
+        cmp.use_osm_extract(args.osm_file)
+
+    try:
+        jobs = load_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    summary = run_batch(jobs, args.workers, args.output_dir, args.summary)
+    print(f"\n✓ {summary['succeeded']} succeeded, ✗ {summary['failed']} failed in {summary['seconds']:.1f}s")
+    sys.exit(1 if summary["failed"] else 0)
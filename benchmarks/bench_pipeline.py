@@ -0,0 +1,352 @@
+"""
+Pipeline benchmark: cache load, projection and packing, classification,
+scene building, drawing and saving, stage by stage.
+
+Runs on synthetic fixture cities (small, medium, metro): jittered street
+grids with a road hierarchy, lakes, a river and parks, so no network is
+needed and every run sees the same data. Each fixture runs in a fresh
+interpreter, which makes peak RSS a per-fixture number. Stage times are
+the best of --runs.
+
+Results are stored as a baseline (benchmarks/baseline_pipeline.json),
+so PRs can be checked against it. The run fails when a number that does
+not depend on the machine changes: edge, segment and point counts differ,
+or an output file grows by more than --size-tolerance. Timings and peak
+memory only mean something on the machine that recorded them, so they
+are compared on that machine alone, and only as warnings.
+
+Usage:
+  python benchmarks/bench_pipeline.py [--fixtures small medium metro] [--runs 3] [--formats png svg pdf]
+  python benchmarks/bench_pipeline.py --save-baseline
+  python benchmarks/bench_pipeline.py --baseline benchmarks/baseline_pipeline.json --tolerance 0.25 --size-tolerance 0.02
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline_pipeline.json")
+
+# Grid size (nodes per side), lakes and parks of each synthetic city
+FIXTURES = {
+    "small": {"grid": 40, "lakes": 3, "parks": 40},
+    "medium": {"grid": 120, "lakes": 8, "parks": 300},
+    "metro": {"grid": 300, "lakes": 20, "parks": 1500},
+}
+
+CENTER = (46.05, 14.5)
+
+# Grid spacing in degrees, about 115-165 m
+STEP = 0.0015
+
+# Stages faster than this are too noisy to compare against the baseline
+MIN_COMPARE_SECONDS = 0.02
+
+# Results that do not depend on the machine; any change fails the check
+COUNTS = ("edges", "segments", "points")
+
+STAGES = (
+    "load_graph", "classify", "pack_roads", "load_road_layer", "project_features",
+    "load_features", "build_scene", "plot", "text", "draw_polygons", "draw_roads", "draw_gradients",
+    "draw_text",
+)
+
+
+def make_graph(grid, rng):
+    """
+    Unsimplified street grid around CENTER, like osmnx returns it. Every
+    20th street is a motorway, then primary, secondary and tertiary roads
+    at shorter intervals; the rest are residential, service or footways.
+    """
+    import networkx as nx
+
+    G = nx.MultiDiGraph(crs="epsg:4326")
+    lat0 = CENTER[0] - grid / 2 * STEP
+    lon0 = CENTER[1] - grid / 2 * STEP
+    jitter = rng.uniform(-0.3, 0.3, size=(grid, grid, 2)) * STEP
+    G.add_nodes_from(
+        (i * grid + j, {"y": lat0 + i * STEP + jitter[i, j, 0], "x": lon0 + j * STEP + jitter[i, j, 1], "street_count": 4})
+        for i in range(grid) for j in range(grid)
+    )
+
+    def street_type(index):
+        for every, highway in ((20, "motorway"), (10, "primary"), (5, "secondary"), (3, "tertiary")):
+            if index % every == 0:
+                return highway
+        return None
+
+    minor = rng.choice(["residential", "residential", "service", "footway"], size=(grid, grid, 2))
+    osmid = 0
+    for i in range(grid):
+        for j in range(grid):
+            for axis, (di, dj) in enumerate(((0, 1), (1, 0))):
+                if i + di >= grid or j + dj >= grid:
+                    continue
+                u, v = i * grid + j, (i + di) * grid + j + dj
+                highway = street_type(i if axis == 0 else j) or minor[i, j, axis]
+                attrs = {"osmid": osmid, "highway": highway, "oneway": False, "length": STEP * 111_000}
+                G.add_edge(u, v, **attrs)
+                G.add_edge(v, u, reversed=True, **attrs)
+                osmid += 1
+    return G
+
+
+def make_features(grid, lakes, parks, rng):
+    """
+    Water (round lakes and a winding river) and parks (small blocks) as
+    unprojected GeoDataFrames.
+    """
+    import numpy as np
+    import shapely
+    from geopandas import GeoDataFrame
+
+    span = grid * STEP
+    lat0, lon0 = CENTER[0] - span / 2, CENTER[1] - span / 2
+
+    centers = rng.uniform(0, span, size=(lakes, 2))
+    radii = rng.uniform(2, 8, size=lakes) * STEP
+    water = list(shapely.buffer(shapely.points(lon0 + centers[:, 1], lat0 + centers[:, 0]), radii))
+    t = np.linspace(0, 1, 200)
+    river = shapely.LineString(np.column_stack((lon0 + t * span, CENTER[0] + np.sin(t * 6 * np.pi) * span / 6)))
+    water.append(river.buffer(STEP))
+
+    corners = rng.uniform(0, span, size=(parks, 2))
+    sizes = rng.uniform(0.5, 3, size=(parks, 2)) * STEP
+    green = shapely.box(lon0 + corners[:, 1], lat0 + corners[:, 0], lon0 + corners[:, 1] + sizes[:, 1], lat0 + corners[:, 0] + sizes[:, 0])
+
+    return (
+        GeoDataFrame({"natural": ["water"] * len(water)}, geometry=water, crs="EPSG:4326"),
+        GeoDataFrame({"leisure": ["park"] * len(green)}, geometry=list(green), crs="EPSG:4326"),
+    )
+
+
+def run_fixture(name, runs, formats, dpi, width, height):
+    """
+    Runs the pipeline on one fixture in this process. Returns the best time
+    of every stage, the output size per format and the peak RSS.
+    """
+    os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="bench_cache_")
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+
+    import numpy as np
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    import create_map_poster as cmp
+    from profiling import peak_rss_bytes
+
+    spec = FIXTURES[name]
+    rng = np.random.default_rng(0)
+    G = make_graph(spec["grid"], rng)
+    water, parks = make_features(spec["grid"], spec["lakes"], spec["parks"], rng)
+    # The compensated radius then covers about 90% of the grid
+    dist = 3 * 0.45 * spec["grid"] * STEP * 111_000
+    theme = cmp.load_theme("feature_based")
+    crs = cmp.get_utm_crs(CENTER)
+    cmp.CACHE.set("bench_graph", G, "graphs")
+
+    timings = {}
+    output_bytes = {}
+
+    def timed(stage, fn, *args, **kwargs):
+        started = time.perf_counter()
+        result = fn(*args, **kwargs)
+        seconds = time.perf_counter() - started
+        timings[stage] = min(timings.get(stage, seconds), seconds)
+        return result
+
+    for _ in range(runs):
+        G_cached = timed("load_graph", cmp.CACHE.get, "bench_graph", "graphs")
+        timed("classify", cmp.classify_roads, G_cached)
+        # Projection, classification and packing of the cold path
+        roads = timed("pack_roads", cmp.pack_road_layer, G_cached, crs)
+
+        cmp.CACHE.set_arrays("bench_roads", {k: roads[k] for k in cmp.ROAD_LAYER_ARRAYS}, {"crs": roads["crs"]}, "graphs")
+        timed("load_road_layer", cmp.CACHE.get_arrays, "bench_roads", "graphs")
+
+        water_proj, parks_proj = timed("project_features", lambda: (cmp.project_polygons(water, crs), cmp.project_polygons(parks, crs)))
+        cmp.CACHE.set("bench_features", (water_proj, parks_proj), "projected")
+        timed("load_features", cmp.CACHE.get, "bench_features", "projected")
+
+        scene = timed("build_scene", cmp.build_scene, CENTER, dist, width, height, dpi, roads, water_proj, parks_proj)
+
+        fig, layers = timed("plot", cmp.render_base, scene, theme)
+        layers["text"] = timed("text", cmp.draw_labels, layers["ax"], CENTER, width, theme, "Benchmark", "Fixture")
+
+        # Draw once for the layout, then time each layer on its own
+        canvas = FigureCanvasAgg(fig)
+        fig.set_dpi(dpi)
+        canvas.draw()
+        renderer = canvas.get_renderer()
+        timed("draw_polygons", lambda: [layers[k].draw(renderer) for k in ("water", "parks") if layers[k] is not None])
+        timed("draw_roads", layers["roads"].draw, renderer)
+        timed("draw_gradients", lambda: [image.draw(renderer) for image, _ in layers["gradients"]])
+        timed("draw_text", lambda: [artist.draw(renderer) for artist in layers["text"]])
+
+        for fmt in formats:
+            buffer = io.BytesIO()
+            timed(f"save_{fmt}", cmp.export_poster, fig, [fmt], theme, {fmt: buffer}, dpi=dpi)
+            output_bytes[fmt] = buffer.tell()
+
+    shutil.rmtree(os.environ["CACHE_DIR"], ignore_errors=True)
+    return {
+        "edges": G.number_of_edges(),
+        "segments": len(roads["classes"]),
+        "points": len(roads["coords"]),
+        "stages": {stage: round(seconds, 4) for stage, seconds in timings.items()},
+        "total": round(sum(timings.values()), 4),
+        "peak_rss_bytes": peak_rss_bytes(),
+        "output_bytes": output_bytes,
+    }
+
+
+def run_fixture_process(name, args):
+    """
+    Runs one fixture in a fresh interpreter and returns its result.
+    """
+    command = [sys.executable, os.path.abspath(__file__), "--child", name, "--runs", str(args.runs),
+               "--dpi", str(args.dpi), "--width", str(args.width), "--height", str(args.height), "--formats", *args.formats]
+    result = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+    line = next((l for l in result.stdout.splitlines() if l.startswith("RESULT:")), None)
+    if line is None:
+        raise RuntimeError(f"Fixture {name} crashed:\n{result.stderr}")
+    return json.loads(line[len("RESULT:"):])
+
+
+def print_results(results, formats):
+    names = list(results)
+    print(f"\n{'Stage':<18}" + "".join(f"{name:>12}" for name in names))
+    print("-" * (18 + 12 * len(names)))
+    for stage in (*STAGES, *(f"save_{fmt}" for fmt in formats), "total"):
+        cells = []
+        for name in names:
+            seconds = results[name]["total"] if stage == "total" else results[name]["stages"].get(stage)
+            cells.append(f"{seconds * 1000:>10.1f}ms" if seconds is not None else f"{'-':>12}")
+        print(f"{stage:<18}" + "".join(cells))
+    print("-" * (18 + 12 * len(names)))
+    for count in COUNTS:
+        print(f"{count:<18}" + "".join(f"{results[name][count]:>12}" for name in names))
+    print(f"{'peak RSS':<18}" + "".join(f"{results[name]['peak_rss_bytes'] / 1024**2:>10.0f}MB" for name in names))
+    for fmt in formats:
+        print(f"{fmt + ' size':<18}" + "".join(f"{results[name]['output_bytes'][fmt] / 1024:>10.0f}KB" for name in names))
+
+
+def check(results, baseline, size_tolerance, compare_sizes=True):
+    """
+    Changes in the machine-independent results: counts that differ from the
+    baseline and output sizes more than size_tolerance above it.
+    """
+    failures = []
+    for name, result in results.items():
+        base = baseline["fixtures"].get(name)
+        if base is None:
+            continue
+        for count in COUNTS:
+            if base.get(count) is not None and result[count] != base[count]:
+                failures.append(f"{name}/{count}: {base[count]} -> {result[count]}")
+        if not compare_sizes:
+            continue
+        for fmt, size in result["output_bytes"].items():
+            before = base["output_bytes"].get(fmt)
+            if before is not None and size > before * (1 + size_tolerance):
+                failures.append(f"{name}/{fmt} size: {before / 1024:.0f} -> {size / 1024:.0f} KB (+{(size / before - 1) * 100:.1f}%)")
+    return failures
+
+
+def compare_timings(results, baseline, tolerance):
+    """
+    Stage times and peak RSS more than tolerance above the baseline.
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline["fixtures"].get(name)
+        if base is None:
+            continue
+        for stage, seconds in result["stages"].items():
+            before = base["stages"].get(stage)
+            if before is None or max(before, seconds) < MIN_COMPARE_SECONDS:
+                continue
+            if seconds > before * (1 + tolerance):
+                regressions.append(f"{name}/{stage}: {before * 1000:.1f} -> {seconds * 1000:.1f} ms (+{(seconds / before - 1) * 100:.0f}%)")
+        rss, before = result["peak_rss_bytes"], base["peak_rss_bytes"]
+        if rss and before and rss > before * (1 + tolerance):
+            regressions.append(f"{name}/peak RSS: {before / 1024**2:.0f} -> {rss / 1024**2:.0f} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the poster pipeline stage by stage")
+    parser.add_argument("--fixtures", nargs="+", default=list(FIXTURES), choices=list(FIXTURES), help="Fixtures to run (default: all)")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per fixture; the best time of each stage counts (default: 3)")
+    parser.add_argument("--formats", nargs="+", default=["png", "svg", "pdf"], choices=["png", "svg", "pdf"], help="Formats to save (default: all)")
+    parser.add_argument("--dpi", type=int, default=300, help="Output resolution (default: 300)")
+    parser.add_argument("--width", type=float, default=12, help="Poster width in inches (default: 12)")
+    parser.add_argument("--height", type=float, default=16, help="Poster height in inches (default: 16)")
+    parser.add_argument("--baseline", default=BASELINE, help="Baseline to compare against, if it exists (default: benchmarks/baseline_pipeline.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Slowdown warned about on the baseline machine, 0.25 = 25%% (default: 0.25)")
+    parser.add_argument("--size-tolerance", type=float, default=0.02, help="Allowed output size growth before failing, 0.02 = 2%% (default: 0.02)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = run_fixture(args.child, args.runs, args.formats, args.dpi, args.width, args.height)
+        print("RESULT:" + json.dumps(result))
+        return
+
+    results = {}
+    for name in args.fixtures:
+        print(f"Running {name}...", flush=True)
+        results[name] = run_fixture_process(name, args)
+    print_results(results, args.formats)
+
+    if args.save_baseline:
+        baseline = {
+            "settings": {"runs": args.runs, "dpi": args.dpi, "width": args.width, "height": args.height, "formats": args.formats},
+            "machine": {"python": platform.python_version(), "platform": platform.platform(), "processor": platform.machine()},
+            "fixtures": results,
+        }
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"\n✓ Baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("\n⚠ No baseline to compare against; create one with --save-baseline")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    settings = {"dpi": args.dpi, "width": args.width, "height": args.height}
+    same_settings = all(baseline["settings"].get(key) == value for key, value in settings.items())
+    if not same_settings:
+        print(f"\n⚠ Baseline was recorded with other settings: {baseline['settings']}; output sizes are not compared")
+
+    if baseline["machine"]["platform"] != platform.platform():
+        print(f"\n⚠ Baseline timings were recorded on {baseline['machine']['platform']}; not compared here")
+    else:
+        regressions = compare_timings(results, baseline, args.tolerance)
+        if regressions:
+            print("\n⚠ Slower than the baseline (advisory; rerun with more --runs to rule out noise):")
+            for regression in regressions:
+                print(f"  {regression}")
+
+    failures = check(results, baseline, args.size_tolerance, compare_sizes=same_settings)
+    if failures:
+        print()
+        for failure in failures:
+            print(f"✗ {failure}")
+        print("If the change is intended, update the baseline with --save-baseline")
+        sys.exit(1)
+    print(f"\n✓ Counts match the baseline and no output is more than {args.size_tolerance:.0%} larger")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Startup-time benchmark for the CLI fast paths.
+
+Theme discovery, the usage text and argument errors must not load the geo
+or plotting stacks. Each command is run in a fresh interpreter; the
+benchmark fails if a heavy module gets imported or a command is slower
+than the budget.
+
+Usage:
+  python benchmarks/bench_startup.py [--runs 5] [--budget 1.0]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ("osmnx", "geopandas", "shapely", "matplotlib", "networkx", "geopy", "numpy", "pandas", "tqdm")
+
+COMMANDS = {
+    "list-themes": ["--list-themes"],
+    "usage": [],
+    "missing-country": ["--city", "Paris"],
+}
+
+# Runs the CLI, then reports which heavy modules ended up imported
+PROBE = """
+import runpy, sys
+sys.argv = ["create_map_poster.py"] + sys.argv[1:]
+try:
+    runpy.run_path("create_map_poster.py", run_name="__main__")
+except SystemExit:
+    pass
+heavy = [m for m in {heavy!r} if m in sys.modules]
+sys.stderr.write("HEAVY:" + ",".join(heavy) + "\\n")
+"""
+
+
+def run_command(args):
+    """
+    Runs one CLI invocation. Returns (seconds, heavy modules loaded).
+    """
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(heavy=HEAVY_MODULES), *args],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    seconds = time.perf_counter() - started
+    line = next((l for l in result.stderr.splitlines() if l.startswith("HEAVY:")), None)
+    if line is None:
+        raise RuntimeError(f"CLI crashed:\n{result.stderr}")
+    return seconds, [m for m in line[len("HEAVY:"):].split(",") if m]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CLI startup fast paths")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per command (default: 5)")
+    parser.add_argument("--budget", type=float, default=1.0, help="Max median seconds per command (default: 1.0)")
+    args = parser.parse_args()
+
+    failures = []
+    for name, cli_args in COMMANDS.items():
+        timings = []
+        for _ in range(args.runs):
+            seconds, heavy = run_command(cli_args)
+            timings.append(seconds)
+            if heavy:
+                failures.append(f"{name}: imported {', '.join(heavy)}")
+                break
+        median = sorted(timings)[len(timings) // 2]
+        print(f"{name:<16} median {median * 1000:7.1f} ms  (min {min(timings) * 1000:.1f} ms)")
+        if median > args.budget:
+            failures.append(f"{name}: {median:.2f}s over the {args.budget:.2f}s budget")
+
+    if failures:
+        for failure in failures:
+            print(f"✗ {failure}")
+        sys.exit(1)
+    print("✓ Startup fast paths stay light")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,71 +1,125 @@
-from matplotlib.figure import Figure
-from networkx import MultiDiGraph
-import osmnx as ox
-import matplotlib.pyplot as plt
-from matplotlib.font_manager import FontProperties
-import matplotlib.colors as mcolors
-import numpy as np
-from geopy.geocoders import Nominatim
-from tqdm import tqdm
+from __future__ import annotations
+
 import time
 import json
 import os
 import sys
 from datetime import datetime
+from functools import lru_cache, partial
 import argparse
-import pickle
-import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
 from pathlib import Path
 from hashlib import md5
-from typing import cast
-from geopandas import GeoDataFrame
-import pickle
-from shapely.geometry import Point
+from typing import TYPE_CHECKING, cast
+
+import profiling
+from poster_cache import CacheError, DiskCache
 
-class CacheError(Exception):
-    """Raised when a cache operation fails."""
-    pass
+# The geo and plotting stacks are imported inside the functions that use
+# them, so --list-themes, usage help and argument errors start instantly
+if TYPE_CHECKING:
+    from geopandas import GeoDataFrame
+    from networkx import MultiDiGraph
 
 CACHE_DIR_PATH = os.environ.get("CACHE_DIR", "cache")
 CACHE_DIR = Path(CACHE_DIR_PATH)
-CACHE_DIR.mkdir(exist_ok=True)
-
+# Byte budget for the cache; least recently used entries are evicted beyond it
+CACHE_MAX_BYTES = int(os.environ.get("CACHE_MAX_BYTES", 2 * 1024**3))
 
 THEMES_DIR = "themes"
 FONTS_DIR = "fonts"
 POSTERS_DIR = "posters"
 
-CACHE_DIR = ".cache"
+# Geometry outside the crop window (plus this fraction of its size) is not drawn
+CLIP_MARGIN = 0.01
+
+# Output resolution; also sets the level of detail geometries are simplified to
+DPI = 300
+# Simplification tolerance as a fraction of one output pixel
+SIMPLIFY_PIXELS = 0.5
+# Resolution of quick previews, rendered before the full-quality poster
+PREVIEW_DPI = 50
+
+# "exact": the canvas is the figure, width*dpi x height*dpi pixels, drawn once.
+# "tight": legacy bbox_inches="tight" cropping, which costs an extra draw pass.
+LAYOUTS = ("exact", "tight")
+LAYOUT = "exact"
+
+# Exact-layout PNGs larger than this are rendered and compressed in strips of
+# STRIP_ROWS rows, so Agg never allocates the whole canvas (see tiled_render.py)
+MAX_CANVAS_PIXELS = 64_000_000
+STRIP_ROWS = 1024
+
+# Alternative service endpoints, e.g. a self-hosted or local stand-in server
+OVERPASS_URL = os.environ.get("OVERPASS_URL")
+NOMINATIM_URL = os.environ.get("NOMINATIM_URL")
+
+# Bundled city,country,lat,lon list looked up before geocoding; empty disables it
+GAZETTEER_SEED = os.environ.get("GAZETTEER_SEED", "gazetteer.csv")
+
+# Local OSM extract (.osm, .osm.bz2 or .osm.pbf) to read map data from
+# instead of Overpass; see data_sources.py
+OSM_EXTRACT = os.environ.get("OSM_EXTRACT")
+
+WATER_TAGS = {'natural': 'water', 'waterway': 'riverbank'}
+PARKS_TAGS = {'leisure': 'park', 'landuse': 'grass'}
+
+# OSM data is downloaded and cached in web-mercator tiles of this zoom level,
+# so nearby and overlapping posters reuse each other's downloads
+TILE_ZOOM = 13
+
+CACHE = DiskCache(CACHE_DIR, max_bytes=CACHE_MAX_BYTES)
+
+# Cache key prefix -> namespace
+CACHE_NAMESPACES = {
+    "coords": "coords",
+    "graph": "graphs",
+    "roads": "graphs",
+    "water": "features",
+    "parks": "features",
+    "projected": "projected",
+    "base": "bases",
+    "extract": "extracts",
+}
 
-class CacheError(Exception):
-    pass
 
+def _cache_namespace(key: str) -> str:
+    return CACHE_NAMESPACES.get(key.split("_", 1)[0], "default")
 
-def _cache_path(key: str) -> str:
-    safe = key.replace(os.sep, "_")
-    return os.path.join(CACHE_DIR, f"{safe}.pkl")
+
+def _record_lookup(key, value):
+    profiling.event("cache.miss" if value is None else "cache.hit", namespace=_cache_namespace(key), key=key)
+    return value
 
 
 def cache_get(key: str):
-    try:
-        path = _cache_path(key)
-        if not os.path.exists(path):
-            return None
-        with open(path, "rb") as f:
-            return pickle.load(f)
-    except Exception as e:
-        raise CacheError(f"Cache read failed: {e}")
+    return _record_lookup(key, CACHE.get(key, _cache_namespace(key)))
 
 
 def cache_set(key: str, value):
-    try:
-        if not os.path.exists(CACHE_DIR):
-            os.makedirs(CACHE_DIR)
-        path = _cache_path(key)
-        with open(path, "wb") as f:
-            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
-    except Exception as e:
-        raise CacheError(f"Cache write failed: {e}")
+    CACHE.set(key, value, _cache_namespace(key))
+
+
+def cache_get_arrays(key: str):
+    return _record_lookup(key, CACHE.get_arrays(key, _cache_namespace(key)))
+
+
+def cache_set_arrays(key: str, arrays, attrs=None):
+    CACHE.set_arrays(key, arrays, attrs, _cache_namespace(key))
+
+
+def print_cache_stats():
+    """Print per-namespace cache usage."""
+    stats = CACHE.stats()
+    print(f"\nCache: {CACHE_DIR} (budget {CACHE_MAX_BYTES / 1024**2:.0f} MB)")
+    print("-" * 60)
+    if not stats:
+        print("  empty")
+    for namespace, ns in sorted(stats.items()):
+        print(f"  {namespace:<10} {ns['entries']:>6} entries  {ns['bytes'] / 1024**2:>10.1f} MB")
+    print()
 
 
 def load_fonts():
@@ -102,6 +156,20 @@ def generate_output_filename(city, theme_name, output_format):
     filename = f"{city_slug}_{theme_name}_{timestamp}.{ext}"
     return os.path.join(POSTERS_DIR, filename)
 
+def preview_filename(outputs):
+    """
+    Path of the preview written next to a poster's outputs.
+    """
+    base, _ = os.path.splitext(next(iter(outputs.values())))
+    return f"{base}_preview.png"
+
+def save_preview(path, png):
+    """
+    Writes preview PNG bytes, see create_poster(preview=...).
+    """
+    write_output(path, png)
+    print(f"✓ Preview saved as {path}")
+
 def get_available_themes():
     """
     Scans the themes directory and returns a list of available theme names.
@@ -151,13 +219,12 @@ def load_theme(theme_name="feature_based"):
 # Load theme (can be changed via command line or input)
 THEME = dict[str, str]()  # Will be loaded later
 
-def create_gradient_fade(ax, color, location='bottom', zorder=10):
+def get_gradient_cmap(color, location='bottom'):
     """
-    Creates a fade effect at the top or bottom of the map.
+    Builds the single-color colormap used by the top/bottom fades.
     """
-    vals = np.linspace(0, 1, 256).reshape(-1, 1)
-    gradient = np.hstack((vals, vals))
-    
+    import numpy as np
+    import matplotlib.colors as mcolors
     rgb = mcolors.to_rgb(color)
     my_colors = np.zeros((256, 4))
     my_colors[:, 0] = rgb[0]
@@ -166,14 +233,28 @@ def create_gradient_fade(ax, color, location='bottom', zorder=10):
     
     if location == 'bottom':
         my_colors[:, 3] = np.linspace(1, 0, 256)
+    else:
+        my_colors[:, 3] = np.linspace(0, 1, 256)
+
+    return mcolors.ListedColormap(my_colors)
+
+def create_gradient_fade(ax, color, location='bottom', zorder=10):
+    """
+    Creates a fade effect at the top or bottom of the map.
+    Returns the image artist so the fade can be recolored later.
+    """
+    import numpy as np
+    vals = np.linspace(0, 1, 256).reshape(-1, 1)
+    gradient = np.hstack((vals, vals))
+    
+    if location == 'bottom':
         extent_y_start = 0
         extent_y_end = 0.25
     else:
-        my_colors[:, 3] = np.linspace(0, 1, 256)
         extent_y_start = 0.75
         extent_y_end = 1.0
 
-    custom_cmap = mcolors.ListedColormap(my_colors)
+    custom_cmap = get_gradient_cmap(color, location)
     
     xlim = ax.get_xlim()
     ylim = ax.get_ylim()
@@ -182,139 +263,120 @@ def create_gradient_fade(ax, color, location='bottom', zorder=10):
     y_bottom = ylim[0] + y_range * extent_y_start
     y_top = ylim[0] + y_range * extent_y_end
     
-    ax.imshow(gradient, extent=[xlim[0], xlim[1], y_bottom, y_top], 
-              aspect='auto', cmap=custom_cmap, zorder=zorder, origin='lower')
+    return ax.imshow(gradient, extent=[xlim[0], xlim[1], y_bottom, y_top], 
+                     aspect='auto', cmap=custom_cmap, zorder=zorder, origin='lower')
+
+# Road classes ordered from most to least important. classify_roads() returns
+# indices into this tuple, so palettes are plain per-class lookups.
+ROAD_CLASSES = ('motorway', 'trunk', 'primary', 'secondary', 'tertiary', 'residential', 'other')
+# Road classes drawn in previews
+PREVIEW_ROAD_CLASSES = ROAD_CLASSES[:ROAD_CLASSES.index('secondary') + 1]
+
+HIGHWAY_CLASSES = {
+    'motorway': 0, 'motorway_link': 0,
+    'trunk': 1, 'trunk_link': 1,
+    'primary': 2, 'primary_link': 2,
+    'secondary': 3, 'secondary_link': 3,
+    'tertiary': 4, 'tertiary_link': 4,
+    'residential': 5, 'living_street': 5, 'unclassified': 5,
+}
+
+# Line widths by road importance. Major roads get thicker lines.
+ROAD_WIDTHS = {
+    'motorway': 1.2,
+    'trunk': 1.0,
+    'primary': 1.0,
+    'secondary': 0.8,
+    'tertiary': 0.6,
+    'residential': 0.4,
+    'other': 0.4,
+}
 
-def get_edge_colors_by_type(G):
+def classify_roads(edges):
     """
-    Assigns colors to edges based on road type hierarchy.
-    Returns a list of colors corresponding to each edge in the graph.
+    Maps the highway tag of every edge to a compact integer road class.
+    Accepts an edges GeoDataFrame (or a graph) and returns an int8 array
+    indexing ROAD_CLASSES, in edge order.
     """
-    edge_colors = []
-    
-    for u, v, data in G.edges(data=True):
-        # Get the highway type (can be a list or string)
-        highway = data.get('highway', 'unclassified')
-        
-        # Handle list of highway types (take the first one)
-        if isinstance(highway, list):
-            highway = highway[0] if highway else 'unclassified'
-        
-        # Assign color based on road type
-        if highway in ['motorway', 'motorway_link']:
-            color = THEME['road_motorway']
-        elif highway in ['trunk', 'trunk_link', 'primary', 'primary_link']:
-            color = THEME['road_primary']
-        elif highway in ['secondary', 'secondary_link']:
-            color = THEME['road_secondary']
-        elif highway in ['tertiary', 'tertiary_link']:
-            color = THEME['road_tertiary']
-        elif highway in ['residential', 'living_street', 'unclassified']:
-            color = THEME['road_residential']
-        else:
-            color = THEME['road_default']
-        
-        edge_colors.append(color)
-    
-    return edge_colors
+    with profiling.stage("classify") as info:
+        classes = _classify_roads(edges)
+        info["edges"] = len(classes)
+    return classes
+
+def _classify_roads(edges):
+    import numpy as np
+    import pandas as pd
+    if hasattr(edges, 'columns'):
+        if 'highway' not in edges.columns:
+            return np.full(len(edges), HIGHWAY_CLASSES['unclassified'], dtype=np.int8)
+        highway = edges['highway']
+    else:
+        # Straight from the edge data, in graph_to_gdfs() order, without building a GeoDataFrame
+        highway = pd.Series([data.get('highway') for _, _, data in edges.edges(data=True)], dtype=object)
+
+    # Merged edges carry a list of highway types; take the first one
+    highway = highway.reset_index(drop=True).explode()
+    highway = highway[~highway.index.duplicated(keep='first')]
 
-def get_edge_widths_by_type(G):
+    classes = highway.map(HIGHWAY_CLASSES)
+    classes = classes.mask(highway.isna(), HIGHWAY_CLASSES['unclassified'])
+    classes = classes.fillna(ROAD_CLASSES.index('other'))
+    return classes.to_numpy(dtype=np.int8)
+
+def lookup_by_road_class(classes, values, default=None):
     """
-    Assigns line widths to edges based on road type.
-    Major roads get thicker lines.
+    Vectorized per-edge lookup of a color, width or any other style value.
+    values maps road class names to a value; missing classes use default.
     """
-    edge_widths = []
-    
-    for u, v, data in G.edges(data=True):
-        highway = data.get('highway', 'unclassified')
-        
-        if isinstance(highway, list):
-            highway = highway[0] if highway else 'unclassified'
-        
-        # Assign width based on road importance
-        if highway in ['motorway', 'motorway_link']:
-            width = 1.2
-        elif highway in ['trunk', 'trunk_link', 'primary', 'primary_link']:
-            width = 1.0
-        elif highway in ['secondary', 'secondary_link']:
-            width = 0.8
-        elif highway in ['tertiary', 'tertiary_link']:
-            width = 0.6
-        else:
-            width = 0.4
-        
-        edge_widths.append(width)
-    
-    return edge_widths
+    import numpy as np
+    table = np.empty(len(ROAD_CLASSES), dtype=object)
+    for i, road_class in enumerate(ROAD_CLASSES):
+        table[i] = values.get(road_class, default)
+    return table[classes]
 
-def get_coordinates(city, country):
+def get_road_palette(theme):
     """
-    Fetches coordinates for a given city and country using geopy.
-    Includes rate limiting to be respectful to the geocoding service.
+    Returns the theme colors for every road class.
     """
-    coords = f"coords_{city.lower()}_{country.lower()}"
-    cached = cache_get(coords)
-    if cached:
-        print(f"✓ Using cached coordinates for {city}, {country}")
-        return cached
+    return {
+        'motorway': theme['road_motorway'],
+        'trunk': theme['road_primary'],
+        'primary': theme['road_primary'],
+        'secondary': theme['road_secondary'],
+        'tertiary': theme['road_tertiary'],
+        'residential': theme['road_residential'],
+        'other': theme['road_default'],
+    }
 
-    print("Looking up coordinates...")
-    geolocator = Nominatim(user_agent="city_map_poster", timeout=10)
-    
-    # Add a small delay to respect Nominatim's usage policy
-    time.sleep(1)
-    
-    try:
-        location = geolocator.geocode(f"{city}, {country}")
-    except Exception as e:
-        raise ValueError(f"Geocoding failed for {city}, {country}: {e}")
+def get_road_colors(classes, theme):
+    """
+    Returns an RGBA array with the theme color of every classified edge.
+    """
+    import matplotlib.colors as mcolors
+    palette = get_road_palette(theme)
+    return mcolors.to_rgba_array([palette[c] for c in ROAD_CLASSES])[classes]
 
-    # If geocode returned a coroutine in some environments, run it to get the result.
-    if asyncio.iscoroutine(location):
-        try:
-            location = asyncio.run(location)
-        except RuntimeError:
-            # If an event loop is already running, try using it to complete the coroutine.
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                # Running event loop in the same thread; raise a clear error.
-                raise RuntimeError("Geocoder returned a coroutine while an event loop is already running. Run this script in a synchronous environment.")
-            location = loop.run_until_complete(location)
-    
-    if location:
-        # Use getattr to safely access address (helps static analyzers)
-        addr = getattr(location, "address", None)
-        if addr:
-            print(f"✓ Found: {addr}")
-        else:
-            print("✓ Found location (address not available)")
-        print(f"✓ Coordinates: {location.latitude}, {location.longitude}")
-        try:
-            cache_set(coords, (location.latitude, location.longitude))
-        except CacheError as e:
-            print(e)
-        return (location.latitude, location.longitude)
-    else:
-        raise ValueError(f"Could not find coordinates for {city}, {country}")
+def get_coordinates(city, country):
+    """
+    Fetches coordinates for a given city and country.
+    Looks in the local gazetteer first (see geocoding.py); only unknown
+    places are geocoded, within the Nominatim rate limit.
+    """
+    with profiling.stage("geocode", place=f"{city}, {country}"):
+        return get_geocoder().resolve(city, country)
     
-def get_crop_limits(G_proj, center_lat_lon, fig, dist):
+def get_crop_limits(crs, center_lat_lon, fig_size, dist):
     """
     Crop inward to preserve aspect ratio while guaranteeing
     full coverage of the requested radius.
     """
+    import numpy as np
     lat, lon = center_lat_lon
 
     # Project center point into graph CRS
-    center = (
-        ox.projection.project_geometry(
-            Point(lon, lat),
-            crs="EPSG:4326",
-            to_crs=G_proj.graph["crs"]
-        )[0]
-    )
-    center_x, center_y = center.x, center.y
+    (center_x, center_y), = project_coords(np.array([[lon, lat]]), crs)
 
-    fig_width, fig_height = fig.get_size_inches()
+    fig_width, fig_height = fig_size
     aspect = fig_width / fig_height
 
     # Start from the *requested* radius
@@ -333,132 +395,758 @@ def get_crop_limits(G_proj, center_lat_lon, fig, dist):
     )
 
 
+class RateLimiter:
+    """
+    Thread-safe token bucket shared by everything that talks to one service.
+    Allows short bursts of `capacity` requests, then `rate` requests per second.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+# Nominatim allows one request per second; Overpass gets short bursts
+NOMINATIM_LIMITER = RateLimiter(rate=1.0)
+OVERPASS_LIMITER = RateLimiter(rate=2.0, capacity=3)
+
+def configure_osmnx():
+    """
+    Points osmnx at OVERPASS_URL / NOMINATIM_URL when set, e.g. a local
+    stand-in server for tests or a self-hosted instance. Turns off the
+    osmnx response cache: fetched data is kept as tiles in CACHE, and
+    osmnx would otherwise write every raw response to ./cache as well,
+    outside the CACHE_MAX_BYTES budget.
+    """
+    import osmnx as ox
+    ox.settings.use_cache = False
+    if OVERPASS_URL:
+        ox.settings.overpass_endpoint = OVERPASS_URL
+    if NOMINATIM_URL:
+        ox.settings.nominatim_endpoint = NOMINATIM_URL
+
+def get_geolocator():
+    """
+    Returns the geopy Nominatim geocoder, honouring NOMINATIM_URL.
+    """
+    from geopy.geocoders import Nominatim
+    if not NOMINATIM_URL:
+        return Nominatim(user_agent="city_map_poster", timeout=10)
+    url = urlparse(NOMINATIM_URL)
+    return Nominatim(user_agent="city_map_poster", timeout=10, domain=url.netloc + url.path.rstrip('/'), scheme=url.scheme)
+
+_GEOCODER = None
+_GEOCODER_LOCK = threading.Lock()
+
+
+def nominatim_geocode(query):
+    from geocoding import geopy_geocode
+    return geopy_geocode(get_geolocator(), query)
+
+
+def get_geocoder():
+    """
+    Returns the shared Geocoder: the seed list and on-disk gazetteer in
+    front of Nominatim.
+    """
+    global _GEOCODER
+    from geocoding import Geocoder
+    with _GEOCODER_LOCK:
+        if _GEOCODER is None:
+            _GEOCODER = Geocoder(nominatim_geocode, cache=CACHE, limiter=NOMINATIM_LIMITER, seed=GAZETTEER_SEED)
+        return _GEOCODER
+
+_DATA_SOURCE = None
+_DATA_SOURCE_LOCK = threading.Lock()
+
+
+def get_data_source():
+    """
+    Returns the data source map data is read from: the OSM_EXTRACT file
+    when set, otherwise the Overpass API.
+    """
+    global _DATA_SOURCE
+    from data_sources import open_data_source
+    with _DATA_SOURCE_LOCK:
+        if _DATA_SOURCE is None:
+            _DATA_SOURCE = open_data_source(OSM_EXTRACT, limiter=OVERPASS_LIMITER, cache=CACHE)
+        return _DATA_SOURCE
+
+
+def use_osm_extract(path):
+    """
+    Reads map data from a local OSM extract from now on. Also exported to
+    the environment, so worker processes use the same extract.
+    """
+    global OSM_EXTRACT, _DATA_SOURCE
+    OSM_EXTRACT = os.path.abspath(path)
+    os.environ["OSM_EXTRACT"] = OSM_EXTRACT
+    with _DATA_SOURCE_LOCK:
+        _DATA_SOURCE = None
+
+
+def source_key(key):
+    """
+    Tags a cache key with the data source, so data from different extracts
+    and from Overpass never mixes. Overpass keys stay untagged.
+    """
+    tag = get_data_source().cache_tag
+    return f"{key}_{tag}" if tag else key
+
+
+def lonlat_to_tile(lon, lat, zoom=TILE_ZOOM):
+    """
+    Converts coordinates to fractional web-mercator tile numbers.
+    Works on scalars and numpy arrays.
+    """
+    import numpy as np
+    n = 2 ** zoom
+    x = (np.asarray(lon) + 180.0) / 360.0 * n
+    y = (1.0 - np.arcsinh(np.tan(np.radians(lat))) / np.pi) / 2.0 * n
+    return x, y
+
+def tile_bounds(tiles, zoom=TILE_ZOOM):
+    """
+    Returns the (north, south, east, west) bbox covering a set of tiles.
+    """
+    import numpy as np
+    n = 2 ** zoom
+    xs = [x for x, _ in tiles]
+    ys = [y for _, y in tiles]
+
+    def lat(y):
+        return float(np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * y / n)))))
+
+    return lat(min(ys)), lat(max(ys) + 1), (max(xs) + 1) / n * 360.0 - 180.0, min(xs) / n * 360.0 - 180.0
+
+def tiles_for_bbox(bbox, zoom=TILE_ZOOM):
+    """
+    Lists the (x, y) tiles intersecting a (north, south, east, west) bbox.
+    """
+    north, south, east, west = bbox
+    x_min, y_min = lonlat_to_tile(west, north, zoom)
+    x_max, y_max = lonlat_to_tile(east, south, zoom)
+    return [
+        (x, y)
+        for x in range(int(x_min), int(x_max) + 1)
+        for y in range(int(y_min), int(y_max) + 1)
+    ]
+
+def split_graph_by_tile(G, tiles, zoom=TILE_ZOOM):
+    """
+    Splits a graph into one subgraph per tile. An edge belongs to the tiles
+    of both its end nodes, so composing neighbouring tiles restores it.
+    """
+    import numpy as np
+    nodes = list(G.nodes)
+    x, y = lonlat_to_tile(
+        np.array([G.nodes[n]['x'] for n in nodes]),
+        np.array([G.nodes[n]['y'] for n in nodes]),
+        zoom,
+    )
+    node_tile = dict(zip(nodes, zip(x.astype(int).tolist(), y.astype(int).tolist())))
+
+    tile_edges = {tile: [] for tile in tiles}
+    for u, v, k in G.edges(keys=True):
+        for tile in {node_tile[u], node_tile[v]}:
+            if tile in tile_edges:
+                tile_edges[tile].append((u, v, k))
+    return {tile: G.edge_subgraph(edges).copy() for tile, edges in tile_edges.items()}
+
+def split_features_by_tile(gdf, tiles, zoom=TILE_ZOOM):
+    """
+    Splits features into one GeoDataFrame per tile they intersect.
+    """
+    import numpy as np
+    import shapely
+    return {
+        tile: gdf.iloc[np.sort(gdf.sindex.query(shapely.box(*tile_box(tile, zoom)), predicate='intersects'))]
+        for tile in tiles
+    }
+
+def tile_box(tile, zoom=TILE_ZOOM):
+    """
+    Returns the (west, south, east, north) bounds of a single tile.
+    """
+    north, south, east, west = tile_bounds([tile], zoom)
+    return west, south, east, north
+
 def fetch_graph(point, dist) -> MultiDiGraph | None:
+    """
+    Returns the street network within dist of point.
+    Data is read from the data source and cached per tile, so overlapping
+    requests only fetch the tiles they are missing.
+    """
+    import osmnx as ox
+    import networkx as nx
+    configure_osmnx()
+    bbox = ox.utils_geo.bbox_from_point(point, dist=dist)
+    tiles = tiles_for_bbox(bbox)
+    graphs = {}
+    for tile in tiles:
+        cached = cache_get(source_key(f"graph_tile_{TILE_ZOOM}_{tile[0]}_{tile[1]}"))
+        if cached is not None:
+            graphs[tile] = cast("MultiDiGraph", cached)
+
+    missing = [tile for tile in tiles if tile not in graphs]
+    if not missing:
+        print("✓ Using cached street network")
+    else:
+        try:
+            # One request for the bbox of all missing tiles, then split it up
+            with profiling.stage("fetch.graph", tiles=len(missing)) as info:
+                G = get_data_source().graph_from_bbox(tile_bounds(missing))
+                info["edges"] = G.number_of_edges()
+        except Exception as e:
+            print(f"OSMnx error while fetching graph: {e}")
+            return None
+        for tile, G_tile in split_graph_by_tile(G, missing).items():
+            graphs[tile] = G_tile
+            try:
+                cache_set(source_key(f"graph_tile_{TILE_ZOOM}_{tile[0]}_{tile[1]}"), G_tile)
+            except CacheError as e:
+                print(e)
+
+    # Assemble the tiles, then match ox.graph_from_point(dist_type='bbox')
+    with profiling.stage("assemble.graph", tiles=len(tiles)) as info:
+        G = nx.compose_all(graphs.values())
+        G = ox.truncate.truncate_graph_bbox(G, bbox=bbox, truncate_by_edge=True, retain_all=True)
+        G = ox.simplify_graph(G)
+        G = ox.utils_graph.get_largest_component(G)
+        info["edges"] = G.number_of_edges()
+    return G
+
+def fetch_features(point, dist, tags, name) -> GeoDataFrame | None:
+    """
+    Returns the features matching tags within dist of point.
+    Cached per tile like fetch_graph().
+    """
+    import osmnx as ox
+    import numpy as np
+    import pandas as pd
+    import shapely
+    from geopandas import GeoDataFrame
+    configure_osmnx()
+    bbox = ox.utils_geo.bbox_from_point(point, dist=dist)
+    tiles = tiles_for_bbox(bbox)
+    tag_hash = md5(json.dumps(tags, sort_keys=True).encode()).hexdigest()[:8]
+    parts = {}
+    for tile in tiles:
+        cached = cache_get(source_key(f"{name}_tile_{TILE_ZOOM}_{tile[0]}_{tile[1]}_{tag_hash}"))
+        if cached is not None:
+            parts[tile] = cast("GeoDataFrame", cached)
+
+    missing = [tile for tile in tiles if tile not in parts]
+    if not missing:
+        print(f"✓ Using cached {name}")
+    else:
+        try:
+            # Empty when nothing matches in these tiles; that is cached too
+            with profiling.stage(f"fetch.{name}", tiles=len(missing)) as info:
+                data = get_data_source().features_from_bbox(tile_bounds(missing), tags)
+                info["features"] = len(data)
+        except Exception as e:
+            print(f"OSMnx error while fetching features: {e}")
+            return None
+        for tile, part in split_features_by_tile(data, missing).items():
+            parts[tile] = part
+            try:
+                cache_set(source_key(f"{name}_tile_{TILE_ZOOM}_{tile[0]}_{tile[1]}_{tag_hash}"), part)
+            except CacheError as e:
+                print(e)
+
+    # Features spanning several tiles are stored once per tile
+    with profiling.stage(f"assemble.{name}", tiles=len(tiles)) as info:
+        data = pd.concat(parts.values())
+        data = data[~data.index.duplicated(keep='first')]
+        north, south, east, west = bbox
+        data = data.iloc[np.sort(data.sindex.query(shapely.box(west, south, east, north), predicate='intersects'))]
+        info["features"] = len(data)
+    return data
+
+
+# Arrays of a packed road layer; this is all the renderer reads
+ROAD_LAYER_ARRAYS = ("coords", "offsets", "classes")
+# Part of the road layer cache key; bump when pack_road_layer() output changes
+ROAD_LAYER_VERSION = 2
+
+def get_utm_crs(point):
+    """
+    CRS of the UTM zone containing point, the zone osmnx would pick for a
+    graph around it. Roads, water, parks and the centre of a poster are
+    all projected to this one CRS.
+    """
     lat, lon = point
-    graph = f"graph_{lat}_{lon}_{dist}"
-    cached = cache_get(graph)
+    zone = int((lon + 180) // 6) % 60 + 1
+    return f"EPSG:{(32700 if lat < 0 else 32600) + zone}"
+
+@lru_cache(maxsize=None)
+def get_transformer(crs):
+    """
+    The lon/lat -> crs transformer, built once per CRS and shared by every
+    layer and thread (pyproj transformers are thread-safe).
+    """
+    from pyproj import Transformer
+    return Transformer.from_crs("EPSG:4326", crs, always_xy=True)
+
+def project_coords(coords, crs):
+    """
+    Projects an N x 2 array of lon/lat coordinates to crs.
+    """
+    import numpy as np
+    x, y = get_transformer(crs).transform(coords[:, 0], coords[:, 1])
+    return np.column_stack((x, y))
+
+def pack_geometries(geometries):
+    """
+    Packs line geometries into one coordinate array plus per-line offsets.
+    """
+    import numpy as np
+    import shapely
+    coords, index = shapely.get_coordinates(geometries, return_index=True)
+    offsets = np.zeros(len(geometries) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(index, minlength=len(geometries)), out=offsets[1:])
+    return coords, offsets
+
+def dedupe_geometries(geometries, classes):
+    """
+    Indices of the edges left after collapsing edges with the same
+    geometry: the u->v and v->u edges of two-way streets and parallel
+    edges. Each drawn line keeps the highest road class among its copies.
+    """
+    import numpy as np
+    import pandas as pd
+    import shapely
+    # normalize() gives reversed lines the same coordinates, hence the same WKB
+    wkb = shapely.to_wkb(shapely.normalize(geometries))
+    major_first = np.argsort(classes, kind='stable')
+    duplicate = pd.Series(wkb[major_first]).duplicated().to_numpy()
+    return np.sort(major_first[~duplicate])
+
+def pack_road_layer(G, crs):
+    """
+    Packs the edge geometries of an unprojected graph into flat arrays for
+    drawing, projected to crs in a single pass over all coordinates.
+    Edges with the same geometry are drawn once (see dedupe_geometries),
+    and edges are ordered from minor to major roads so major roads draw on
+    top. Returns a dict with coords (N x 2), offsets (edge starts plus the
+    end), road classes and the CRS of the coordinates.
+    """
+    import numpy as np
+    import shapely
+    edges = list(G.edges(data=True))
+    classes = classify_roads(G)
+
+    # Simplified edges carry their geometry; the rest are straight segments
+    geometries = np.array([data.get('geometry') for _, _, data in edges], dtype=object)
+    straight = np.flatnonzero([geometry is None for geometry in geometries])
+    if len(straight):
+        xy = {node: (data['x'], data['y']) for node, data in G.nodes(data=True)}
+        ends = np.array([(xy[edges[i][0]], xy[edges[i][1]]) for i in straight], dtype=float)
+        geometries[straight] = shapely.linestrings(ends)
+
+    with profiling.stage("dedupe.roads", edges=len(edges)) as info:
+        keep = dedupe_geometries(geometries, classes)
+        geometries, classes = geometries[keep], classes[keep]
+        info["kept"] = len(keep)
+    order = np.argsort(-classes, kind='stable')
+
+    with profiling.stage("project.roads", edges=len(geometries)) as info:
+        coords, offsets = pack_geometries(geometries[order])
+        coords = project_coords(coords, crs)
+        info["points"] = len(coords)
+        info["bytes"] = coords.nbytes + offsets.nbytes
+    return {
+        "coords": coords,
+        "offsets": offsets,
+        "classes": classes[order],
+        "crs": crs,
+    }
+
+def get_road_layer(point, dist):
+    """
+    Returns the packed road layer for a point and distance.
+    The arrays are cached in the columnar format and memory-mapped on
+    warm renders, which skip loading and projecting the graph altogether.
+    """
+    lat, lon = point
+    crs = get_utm_crs(point)
+    roads = source_key(f"roads_v{ROAD_LAYER_VERSION}_{lat}_{lon}_{dist}_{crs.split(':')[1]}")
+    cached = cache_get_arrays(roads)
     if cached is not None:
-        print("✓ Using cached street network")
-        return cast(MultiDiGraph, cached)
+        print("✓ Using cached road layer")
+        arrays, attrs = cached
+        return dict(arrays, crs=attrs["crs"])
+
+    G = fetch_graph(point, dist)
+    if G is None:
+        return None
 
+    # Project to a metric CRS so distances and aspect are linear (meters)
+    layer = pack_road_layer(G, crs)
     try:
-        G = ox.graph_from_point(point, dist=dist, dist_type='bbox', network_type='all', truncate_by_edge=True)
-        # Rate limit between requests
-        time.sleep(0.5)
-        try:
-            cache_set(graph, G)
-        except CacheError as e:
-            print(e)
-        return G
-    except Exception as e:
-        print(f"OSMnx error while fetching graph: {e}")
+        cache_set_arrays(roads, {k: layer[k] for k in ROAD_LAYER_ARRAYS}, {"crs": layer["crs"]})
+    except CacheError as e:
+        print(e)
+    return layer
+
+def draw_road_layer(ax, roads, theme, zorder=3):
+    """
+    Draws the packed road layer as a single LineCollection with
+    per-segment colors and widths.
+    """
+    import numpy as np
+    from matplotlib.collections import LineCollection
+    segments = np.split(roads["coords"], roads["offsets"][1:-1])
+    collection = LineCollection(
+        segments,
+        colors=get_road_colors(roads["classes"], theme),
+        linewidths=lookup_by_road_class(roads["classes"], ROAD_WIDTHS).astype(float),
+        zorder=zorder,
+    )
+    ax.add_collection(collection, autolim=False)
+    return collection
+
+
+def draw_polygon_layer(ax, gdf, color, zorder):
+    """
+    Draws polygons as a single PathCollection. Unlike GeoDataFrame.plot()
+    the result can be pickled, so figures can be encoded in other processes.
+    """
+    import numpy as np
+    import shapely
+    from matplotlib.collections import PathCollection
+    from matplotlib.path import Path
+    from shapely.geometry.polygon import orient
+    paths = []
+    for polygon in shapely.get_parts(gdf.geometry.values):
+        # Counter-clockwise shells and clockwise holes fill under any fill rule
+        polygon = orient(polygon)
+        rings = [polygon.exterior, *polygon.interiors]
+        paths.append(Path.make_compound_path(*[Path(np.asarray(ring.coords)[:, :2], closed=True) for ring in rings]))
+    collection = PathCollection(paths, facecolor=color, edgecolor='none', zorder=zorder)
+    ax.add_collection(collection, autolim=False)
+    return collection
+
+
+def get_clip_box(crop_xlim, crop_ylim, margin=CLIP_MARGIN):
+    """
+    Returns the crop window, grown by a small margin, as a shapely box.
+    """
+    import shapely
+    pad = margin * max(crop_xlim[1] - crop_xlim[0], crop_ylim[1] - crop_ylim[0])
+    return shapely.box(crop_xlim[0] - pad, crop_ylim[0] - pad, crop_xlim[1] + pad, crop_ylim[1] + pad)
+
+def subset_road_layer(roads, keep):
+    """
+    Returns a packed road layer holding only the edges at the given indices.
+    """
+    import numpy as np
+    counts = np.diff(roads["offsets"])[keep]
+    starts = roads["offsets"][:-1][keep]
+    offsets = np.zeros(len(keep) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    index = np.repeat(starts - offsets[:-1], counts) + np.arange(offsets[-1])
+    return dict(roads, coords=roads["coords"][index], offsets=offsets, classes=roads["classes"][keep])
+
+def get_road_geometries(roads):
+    """
+    Builds shapely linestrings from a packed road layer.
+    """
+    import numpy as np
+    import shapely
+    index = np.repeat(np.arange(len(roads["classes"])), np.diff(roads["offsets"]))
+    return shapely.linestrings(roads["coords"], indices=index)
+
+def clip_road_layer(roads, clip_box):
+    """
+    Drops every edge that does not touch the crop window.
+    Edges crossing the border are kept whole, so line joins stay intact.
+    """
+    import numpy as np
+    import shapely
+    tree = shapely.STRtree(get_road_geometries(roads))
+    keep = np.sort(tree.query(clip_box, predicate='intersects'))
+    return subset_road_layer(roads, keep)
+
+def clip_polygons(gdf, clip_box):
+    """
+    Drops polygons outside the crop window and cuts the rest to it.
+    """
+    import numpy as np
+    if gdf is None:
+        return None
+    gdf = gdf.iloc[np.sort(gdf.sindex.query(clip_box, predicate='intersects'))]
+    if gdf.empty:
         return None
+    gdf = gdf.set_geometry(gdf.geometry.clip_by_rect(*clip_box.bounds))
+    gdf = gdf[gdf.geometry.type.isin(['Polygon', 'MultiPolygon'])]
+    return None if gdf.empty else gdf
 
-def fetch_features(point, dist, tags, name) -> GeoDataFrame | None:
+def get_simplify_tolerance(crop_xlim, width, dpi=DPI):
+    """
+    Ground size in meters of one output pixel, scaled by SIMPLIFY_PIXELS.
+    Detail below this size cannot show up in the output.
+    """
+    return (crop_xlim[1] - crop_xlim[0]) / (width * dpi) * SIMPLIFY_PIXELS
+
+def simplify_road_layer(roads, tolerance):
+    """
+    Simplifies every edge to the given tolerance, which also collapses
+    runs of collinear vertices into single segments.
+    """
+    import shapely
+    lines = shapely.simplify(get_road_geometries(roads), tolerance, preserve_topology=False)
+    coords, offsets = pack_geometries(lines)
+    return dict(roads, coords=coords, offsets=offsets)
+
+def simplify_polygons(gdf, tolerance):
+    """
+    Simplifies polygon outlines to the given tolerance.
+    """
+    if gdf is None:
+        return None
+    gdf = gdf.set_geometry(gdf.geometry.simplify(tolerance, preserve_topology=True))
+    gdf = gdf[~gdf.geometry.is_empty]
+    return None if gdf.empty else gdf
+
+def project_polygons(gdf, crs):
+    """
+    Keeps only polygon/multipolygon features and projects them to crs.
+    Point features would otherwise show up as dots on the map.
+    """
+    import numpy as np
+    import shapely
+    from geopandas import GeoDataFrame
+    if gdf is None or gdf.empty:
+        return None
+    polys = gdf[gdf.geometry.type.isin(['Polygon', 'MultiPolygon'])]
+    if polys.empty:
+        return None
+    with profiling.stage("project.features", features=len(polys)):
+        geometry = shapely.transform(np.asarray(polys.geometry.array), lambda coords: project_coords(coords, crs))
+    # Drawing only needs the outlines, so the tag columns are left behind
+    return GeoDataFrame(geometry=geometry, crs=crs)
+
+def get_feature_layer(point, dist, tags, name):
+    """
+    Returns the polygons of a feature layer projected to the poster CRS,
+    or None. The projected layer is cached as its own tier, so warm
+    renders skip assembling tiles and projecting.
+    """
+    from geopandas import GeoDataFrame
     lat, lon = point
-    tag_str = "_".join(tags.keys())
-    features = f"{name}_{lat}_{lon}_{dist}_{tag_str}"
-    cached = cache_get(features)
+    crs = get_utm_crs(point)
+    tag_hash = md5(json.dumps(tags, sort_keys=True).encode()).hexdigest()[:8]
+    key = source_key(f"projected_{name}_{lat}_{lon}_{dist}_{tag_hash}_{crs.split(':')[1]}")
+    cached = cache_get(key)
     if cached is not None:
-        print(f"✓ Using cached {name}")
-        return cast(GeoDataFrame, cached)
+        print(f"✓ Using cached projected {name}")
+        return None if cached.empty else cached
 
-    try:
-        data = ox.features_from_point(point, tags=tags, dist=dist)
-        # Rate limit between requests
-        time.sleep(0.3)
-        try:
-            cache_set(features, data)
-        except CacheError as e:
-            print(e)
-        return data
-    except Exception as e:
-        print(f"OSMnx error while fetching features: {e}")
+    gdf = fetch_features(point, dist, tags, name)
+    if gdf is None:
+        # Fetch failed: nothing to cache, the next render tries again
         return None
+    layer = project_polygons(gdf, crs)
+    try:
+        cache_set(key, layer if layer is not None else GeoDataFrame(geometry=[], crs=crs))
+    except CacheError as e:
+        print(e)
+    return layer
 
 
+def get_compensated_dist(dist, width, height):
+    """
+    Radius to fetch so the cropped poster still covers the requested area.
+    """
+    return dist * (max(height, width) / min(height, width))/4 # To compensate for viewport crop
 
-def create_poster(city, country, point, dist, output_file, output_format, width=12, height=16, country_label=None, name_label=None):
-    print(f"\nGenerating map for {city}, {country}...")
-    
-    # Progress bar for data fetching
-    with tqdm(total=3, desc="Fetching map data", unit="step", bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt}') as pbar:
-        # 1. Fetch Street Network
-        pbar.set_description("Downloading street network")
-        compensated_dist = dist * (max(height, width) / min(height, width))/4 # To compensate for viewport crop
-        G = fetch_graph(point, compensated_dist)
-        if G is None:
-            raise RuntimeError("Failed to retrieve street network data.")
-        pbar.update(1)
-        
-        # 2. Fetch Water Features
-        pbar.set_description("Downloading water features")
-        water = fetch_features(point, compensated_dist, tags={'natural': 'water', 'waterway': 'riverbank'}, name='water')
-        pbar.update(1)
-        
-        # 3. Fetch Parks
-        pbar.set_description("Downloading parks/green spaces")
-        parks = fetch_features(point, compensated_dist, tags={'leisure': 'park', 'landuse': 'grass'}, name='parks')
-        pbar.update(1)
+_GEO_IMPORT_LOCK = threading.Lock()
+
+
+def import_geo_stack():
+    """
+    Imports shapely, geopandas and osmnx in the calling thread. The fetch
+    functions import them lazily; left to the fetch threads, the first
+    imports run concurrently and fail on half-initialised modules.
+    """
+    import importlib
+    with _GEO_IMPORT_LOCK:
+        for module in ("shapely", "geopandas", "osmnx"):
+            importlib.import_module(module)
+
+
+def fetch_scene_data(point, dist):
+    """
+    Fetches the road layer, water and parks for a point and fetch radius,
+    all projected to the UTM zone of the point. The three layers are downloaded concurrently; OVERPASS_LIMITER keeps
+    the request rate in check.
+    """
+    from tqdm import tqdm
+    # Before anything is submitted to the pool, see import_geo_stack()
+    import_geo_stack()
+    with ThreadPoolExecutor(max_workers=3) as pool, \
+            tqdm(total=3, desc="Fetching map data", unit="step", bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt}') as pbar:
+        futures = {
+            pool.submit(get_road_layer, point, dist): "street network",
+            pool.submit(get_feature_layer, point, dist, tags=WATER_TAGS, name='water'): "water features",
+            pool.submit(get_feature_layer, point, dist, tags=PARKS_TAGS, name='parks'): "parks/green spaces",
+        }
+        for future in as_completed(futures):
+            pbar.set_description(f"Fetched {futures[future]}")
+            pbar.update(1)
+        roads, water, parks = (future.result() for future in futures)
+
+    if roads is None:
+        raise RuntimeError("Failed to retrieve street network data.")
     
     print("✓ All data retrieved successfully!")
-    
-    # 2. Setup Plot
+    return roads, water, parks
+
+def prepare_scene(point, dist, width=12, height=16, dpi=DPI):
+    """
+    Fetches, projects and crops all map data for a poster.
+    Geometries are simplified to the detail visible at the given DPI.
+    The returned scene is theme independent and can be rendered repeatedly.
+    """
+    compensated_dist = get_compensated_dist(dist, width, height)
+    roads, water, parks = fetch_scene_data(point, compensated_dist)
+    return build_scene(point, dist, width, height, dpi, roads, water, parks)
+
+def build_scene(point, dist, width, height, dpi, roads, water, parks):
+    """
+    Crops and simplifies fetched map data into a scene, see
+    prepare_scene(). Takes the packed road layer and the water and parks
+    polygons, all projected to the same CRS.
+    """
+    with profiling.stage("scene"):
+        return _build_scene(point, dist, width, height, dpi, roads, water, parks)
+
+def _build_scene(point, dist, width, height, dpi, roads, water, parks):
+    compensated_dist = get_compensated_dist(dist, width, height)
+    crs = roads["crs"]
+
+    # Determine cropping limits to maintain the poster aspect ratio
+    crop_xlim, crop_ylim = get_crop_limits(crs, point, (width, height), compensated_dist)
+
+    # Drop everything outside the visible window before it reaches matplotlib
+    clip_box = get_clip_box(crop_xlim, crop_ylim)
+    roads = clip_road_layer(roads, clip_box)
+    water = clip_polygons(water, clip_box)
+    parks = clip_polygons(parks, clip_box)
+
+    # Level of detail: nothing smaller than an output pixel survives rendering
+    tolerance = get_simplify_tolerance(crop_xlim, width, dpi)
+
+    return {
+        "point": point,
+        "dist": dist,
+        "width": width,
+        "height": height,
+        "dpi": dpi,
+        "roads": simplify_road_layer(roads, tolerance),
+        "water": simplify_polygons(water, tolerance),
+        "parks": simplify_polygons(parks, tolerance),
+        "crop_xlim": crop_xlim,
+        "crop_ylim": crop_ylim,
+    }
+
+
+def render_base(scene, theme):
+    """
+    Draws the map area of a prepared scene: water, parks, roads and the
+    gradient fades, without any text. Returns the figure and a dict of the
+    themed artists, see apply_theme().
+    """
+    from matplotlib.figure import Figure
+    width, height = scene["width"], scene["height"]
+
     print("Rendering map...")
-    fig, ax = plt.subplots(figsize=(width, height), facecolor=THEME['bg'])
-    ax.set_facecolor(THEME['bg'])
+    # A plain Figure, not pyplot: no global state, so renders can run in threads
+    fig = Figure(figsize=(width, height), facecolor=theme['bg'])
+    ax = fig.add_subplot()
+    ax.set_facecolor(theme['bg'])
     ax.set_position((0.0, 0.0, 1.0, 1.0))
 
-    # Project graph to a metric CRS so distances and aspect are linear (meters)
-    G_proj = ox.project_graph(G)
+    layers = {"ax": ax, "road_classes": scene["roads"]["classes"], "water": None, "parks": None, "roads": None, "gradients": [], "text": []}
     
     # 3. Plot Layers
-    # Layer 1: Polygons (filter to only plot polygon/multipolygon geometries, not points)
-    if water is not None and not water.empty:
-        # Filter to only polygon/multipolygon geometries to avoid point features showing as dots
-        water_polys = water[water.geometry.type.isin(['Polygon', 'MultiPolygon'])]
-        if not water_polys.empty:
-            # Project water features in the same CRS as the graph
-            try:
-                water_polys = ox.projection.project_gdf(water_polys)
-            except Exception:
-                water_polys = water_polys.to_crs(G_proj.graph['crs'])
-            water_polys.plot(ax=ax, facecolor=THEME['water'], edgecolor='none', zorder=1)
-    
-    if parks is not None and not parks.empty:
-        # Filter to only polygon/multipolygon geometries to avoid point features showing as dots
-        parks_polys = parks[parks.geometry.type.isin(['Polygon', 'MultiPolygon'])]
-        if not parks_polys.empty:
-            # Project park features in the same CRS as the graph
-            try:
-                parks_polys = ox.projection.project_gdf(parks_polys)
-            except Exception:
-                parks_polys = parks_polys.to_crs(G_proj.graph['crs'])
-            parks_polys.plot(ax=ax, facecolor=THEME['parks'], edgecolor='none', zorder=2)
+    # Layer 1: Polygons
+    for name, zorder in (("water", 1), ("parks", 2)):
+        if scene[name] is not None:
+            with profiling.stage(f"plot.{name}", features=len(scene[name])):
+                layers[name] = tag_layer(draw_polygon_layer(ax, scene[name], theme[name], zorder=zorder), name)
     
     # Layer 2: Roads with hierarchy coloring
     print("Applying road hierarchy colors...")
-    edge_colors = get_edge_colors_by_type(G_proj)
-    edge_widths = get_edge_widths_by_type(G_proj)
+    with profiling.stage("plot.roads", edges=len(scene["roads"]["classes"])):
+        layers["roads"] = tag_layer(draw_road_layer(ax, scene["roads"], theme), "roads")
 
-    # Determine cropping limits to maintain the poster aspect ratio
-    crop_xlim, crop_ylim = get_crop_limits(G_proj, point, fig, compensated_dist)
-    # Plot the projected graph and then apply the cropped limits
-    ox.plot_graph(
-        G_proj, ax=ax, bgcolor=THEME['bg'],
-        node_size=0,
-        edge_color=edge_colors,
-        edge_linewidth=edge_widths,
-        show=False, close=False
-    )
+    # Apply the cropped limits
+    ax.axis('off')
     ax.set_aspect('equal', adjustable='box')
-    ax.set_xlim(crop_xlim)
-    ax.set_ylim(crop_ylim)
+    ax.set_xlim(scene["crop_xlim"])
+    ax.set_ylim(scene["crop_ylim"])
     
     # Layer 3: Gradients (Top and Bottom)
-    create_gradient_fade(ax, THEME['gradient_color'], location='bottom', zorder=10)
-    create_gradient_fade(ax, THEME['gradient_color'], location='top', zorder=10)
-    
+    with profiling.stage("plot.gradients"):
+        for location in ('bottom', 'top'):
+            image = tag_layer(create_gradient_fade(ax, theme['gradient_color'], location=location, zorder=10), "gradients")
+            layers["gradients"].append((image, location))
+
+    return fig, layers
+
+
+# Artist labels starting with "_" stay out of legends and output files
+LAYER_LABEL = "_poster_layer_"
+
+def tag_layer(artist, name):
+    """
+    Marks an artist as part of a poster layer, so get_draw_stages() can
+    time its drawing. Returns the artist.
+    """
+    if artist is not None:
+        artist.set_label(LAYER_LABEL + name)
+    return artist
+
+def get_draw_stages(fig):
+    """
+    Maps the tagged layer artists of a figure to draw.<layer> stage names,
+    for profiling.trace_draw().
+    """
+    stages = {}
+    for ax in fig.axes:
+        for artist in ax.get_children():
+            label = artist.get_label()
+            if isinstance(label, str) and label.startswith(LAYER_LABEL):
+                stages[artist] = "draw." + label[len(LAYER_LABEL):]
+    return stages
+
+
+def draw_labels(ax, point, width, theme, city, country, country_label=None, name_label=None):
+    """
+    Draws the city name, country, coordinates and attribution onto the
+    poster axes. Returns the artists, so apply_theme() can recolor them.
+    """
+    from matplotlib.font_manager import FontProperties
+    text = []
+
     # Calculate scale factor based on poster width (reference width 12 inches)
     scale_factor = width / 12.0
     
@@ -484,12 +1172,13 @@ def create_poster(city, country, point, dist, output_file, output_format, width=
         font_coords = FontProperties(family='monospace', size=BASE_COORDS * scale_factor)
         font_attr = FontProperties(family='monospace', size=BASE_ATTR * scale_factor)
     
-    spaced_city = "  ".join(list(city.upper()))
+    display_city = name_label if name_label is not None else city
+    spaced_city = "  ".join(list(display_city.upper()))
     
     # Dynamically adjust font size based on city name length to prevent truncation
     # We use the already scaled "main" font size as the starting point.
     base_adjusted_main = BASE_MAIN * scale_factor
-    city_char_count = len(city)
+    city_char_count = len(display_city)
     
     # Heuristic: If length is > 10, start reducing.
     if city_char_count > 10:
@@ -504,23 +1193,23 @@ def create_poster(city, country, point, dist, output_file, output_format, width=
         font_main_adjusted = FontProperties(family='monospace', weight='bold', size=adjusted_font_size)
 
     # --- BOTTOM TEXT ---
-    ax.text(0.5, 0.14, spaced_city, transform=ax.transAxes,
-            color=THEME['text'], ha='center', fontproperties=font_main_adjusted, zorder=11)
+    text.append(ax.text(0.5, 0.14, spaced_city, transform=ax.transAxes,
+            color=theme['text'], ha='center', fontproperties=font_main_adjusted, zorder=11))
     
     country_text = country_label if country_label is not None else country
-    ax.text(0.5, 0.10, country_text.upper(), transform=ax.transAxes,
-            color=THEME['text'], ha='center', fontproperties=font_sub, zorder=11)
+    text.append(ax.text(0.5, 0.10, country_text.upper(), transform=ax.transAxes,
+            color=theme['text'], ha='center', fontproperties=font_sub, zorder=11))
     
     lat, lon = point
     coords = f"{lat:.4f}° N / {lon:.4f}° E" if lat >= 0 else f"{abs(lat):.4f}° S / {lon:.4f}° E"
     if lon < 0:
         coords = coords.replace("E", "W")
     
-    ax.text(0.5, 0.07, coords, transform=ax.transAxes,
-            color=THEME['text'], alpha=0.7, ha='center', fontproperties=font_coords, zorder=11)
+    text.append(ax.text(0.5, 0.07, coords, transform=ax.transAxes,
+            color=theme['text'], alpha=0.7, ha='center', fontproperties=font_coords, zorder=11))
     
-    ax.plot([0.4, 0.6], [0.125, 0.125], transform=ax.transAxes, 
-            color=THEME['text'], linewidth=1 * scale_factor, zorder=11)
+    text.extend(ax.plot([0.4, 0.6], [0.125, 0.125], transform=ax.transAxes, 
+            color=theme['text'], linewidth=1 * scale_factor, zorder=11))
 
     # --- ATTRIBUTION (bottom right) ---
     if FONTS:
@@ -528,24 +1217,397 @@ def create_poster(city, country, point, dist, output_file, output_format, width=
     else:
         font_attr = FontProperties(family='monospace', size=8)
     
-    ax.text(0.98, 0.02, "© OpenStreetMap contributors", transform=ax.transAxes,
-            color=THEME['text'], alpha=0.5, ha='right', va='bottom', 
-            fontproperties=font_attr, zorder=11)
+    text.append(ax.text(0.98, 0.02, "© OpenStreetMap contributors", transform=ax.transAxes,
+            color=theme['text'], alpha=0.5, ha='right', va='bottom', 
+            fontproperties=font_attr, zorder=11))
 
-    # 5. Save
-    print(f"Saving to {output_file}...")
+    return [tag_layer(artist, "text") for artist in text]
 
-    fmt = output_format.lower()
-    save_kwargs = dict(facecolor=THEME["bg"], bbox_inches="tight", pad_inches=0.05,)
+
+def get_preview_scene(scene, dpi=PREVIEW_DPI):
+    """
+    Decimated copy of a scene for a quick preview: major roads only
+    (PREVIEW_ROAD_CLASSES) and every layer simplified to the preview
+    resolution. The scene itself is left untouched.
+    """
+    import numpy as np
+    tolerance = get_simplify_tolerance(scene["crop_xlim"], scene["width"], dpi)
+    roads = scene["roads"]
+    keep = np.flatnonzero(roads["classes"] <= ROAD_CLASSES.index(PREVIEW_ROAD_CLASSES[-1]))
+    return dict(
+        scene,
+        dpi=dpi,
+        roads=simplify_road_layer(subset_road_layer(roads, keep), tolerance),
+        water=simplify_polygons(scene["water"], tolerance),
+        parks=simplify_polygons(scene["parks"], tolerance),
+    )
+
+
+def render_preview(scene, theme, city, country, country_label=None, name_label=None, dpi=PREVIEW_DPI):
+    """
+    Renders a low-resolution preview PNG of a prepared scene, see
+    get_preview_scene(). Returns the PNG bytes.
+    """
+    with profiling.stage("preview", dpi=dpi) as info:
+        preview = get_preview_scene(scene, dpi)
+        info["edges"] = len(preview["roads"]["classes"])
+        fig, _ = render_scene(preview, theme, city, country, country_label=country_label, name_label=name_label)
+        return export_poster(fig, ["png"], theme, dpi=dpi, strip_rows=0)["png"]
+
+
+def render_scene(scene, theme, city, country, country_label=None, name_label=None):
+    """
+    Builds the poster figure for a prepared scene.
+    Returns the figure and a dict of the themed artists, see apply_theme().
+    """
+    fig, layers = render_base(scene, theme)
+    layers["text"] = draw_labels(layers["ax"], scene["point"], scene["width"], theme, city, country,
+                                 country_label=country_label, name_label=name_label)
+    return fig, layers
+
+
+def get_base_key(point, dist, width, height, dpi, theme, kind):
+    """
+    Cache key of a rendered map area. kind is "png" for the raster,
+    "fig" for the pickled text-free figure.
+    """
+    lat, lon = point
+    theme_hash = md5(json.dumps(theme, sort_keys=True).encode()).hexdigest()[:8]
+    # Bases are drawn from the road layer, so they expire with it
+    return source_key(f"base_v{ROAD_LAYER_VERSION}_{lat}_{lon}_{dist}_{width:g}x{height:g}_{dpi}_{theme_hash}_{kind}")
+
+
+def get_base_layer(point, dist, width, height, dpi, theme, raster, on_scene=None):
+    """
+    Returns the map area of a poster, cached per location, size, DPI and
+    theme, so posters that only differ in their labels skip the data and
+    the map rendering.
+
+    raster=True returns the exact-layout raster of the map area as PNG row
+    blocks (see tiled_render.encode_png_blocks), plus where the axes sit in
+    it. Otherwise returns (fig, ax), the text-free figure itself, which
+    keeps SVG and PDF vector.
+
+    on_scene(scene) is called with the prepared scene before the map is
+    rendered, i.e. only when the base layer is not cached.
+    """
+    import io
+    import pickle
+    key = get_base_key(point, dist, width, height, dpi, theme, "png" if raster else "fig")
+    base = cache_get(key)
+    if base is not None:
+        print("✓ Using cached map layer")
+        if raster:
+            return base
+        fig = pickle.loads(base)
+        return fig, fig.axes[0]
+
+    scene = prepare_scene(point, dist, width, height, dpi)
+    if on_scene is not None:
+        on_scene(scene)
+    print("Rendering map layer...")
+    fig, layers = render_base(scene, theme)
+    if raster:
+        import numpy as np
+        from tiled_render import BASE_BLOCK_ROWS, encode_png_blocks
+        buffer = io.BytesIO()
+        with profiling.stage("save.base"), profiling.trace_draw(get_draw_stages(fig)):
+            fig.savefig(buffer, format="rgba", dpi=dpi, facecolor=theme["bg"])
+        image = np.frombuffer(buffer.getbuffer(), dtype=np.uint8)
+        columns = round(width * dpi)
+        base = {
+            "width": columns,
+            "height": len(image) // (columns * 4),
+            "blocks": encode_png_blocks(image.reshape(-1, columns, 4), BASE_BLOCK_ROWS),
+            # Read after drawing, once the equal aspect has been applied
+            "axes_position": list(layers["ax"].get_position().bounds),
+        }
+    else:
+        base = pickle.dumps(fig)
+    try:
+        cache_set(key, base)
+    except CacheError as e:
+        print(e)
+    return base if raster else (fig, layers["ax"])
+
+
+def composite_labels(base, width, height, dpi, theme, city, country, point, country_label=None, name_label=None):
+    """
+    Draws the labels on a transparent canvas and blends them over a cached
+    map raster from get_base_layer(). Only the row blocks the labels touch
+    are decoded and compressed again. Returns the finished PNG bytes.
+    """
+    import io
+    import numpy as np
+    from matplotlib.figure import Figure
+    from tiled_render import BASE_BLOCK_ROWS, assemble_png, decode_png_block, encode_png_block
+
+    fig = Figure(figsize=(width, height))
+    ax = fig.add_axes(base["axes_position"])
+    ax.axis('off')
+    draw_labels(ax, point, width, theme, city, country, country_label=country_label, name_label=name_label)
+    buffer = io.BytesIO()
+    with profiling.trace_draw(get_draw_stages(fig)):
+        fig.savefig(buffer, format="rgba", dpi=dpi, facecolor="none")
+    labels = np.frombuffer(buffer.getbuffer(), dtype=np.uint8).reshape(base["height"], base["width"], 4)
+
+    with profiling.stage("save.png", composite=True) as info:
+        blocks = list(base["blocks"])
+        label_rows = labels[:, :, 3].any(axis=1)
+        touched = np.unique(np.flatnonzero(label_rows) // BASE_BLOCK_ROWS)
+        for i in touched:
+            top = i * BASE_BLOCK_ROWS
+            rows = decode_png_block(blocks[i], base["width"])
+            fg = labels[top:top + len(rows)].astype(np.uint16)
+            alpha = fg[:, :, 3:]
+            rows[:, :, :3] = (fg[:, :, :3] * alpha + rows[:, :, :3] * (255 - alpha) + 127) // 255
+            blocks[i] = encode_png_block(rows)
+        png = assemble_png(base["width"], base["height"], blocks, dpi)
+        info.update(blocks=len(touched), bytes=len(png))
+    return png
+
+
+def write_output(target, data):
+    """
+    Writes encoded poster bytes to a path or a writable file-like object.
+    """
+    if isinstance(target, (str, os.PathLike)):
+        with open(target, "wb") as f:
+            f.write(data)
+    else:
+        target.write(data)
+
+
+def apply_theme(fig, layers, theme):
+    """
+    Restyles an already rendered poster with another theme.
+    Only colors change, so no data is refetched or redrawn from scratch.
+    """
+    ax = layers["ax"]
+    fig.set_facecolor(theme['bg'])
+    ax.set_facecolor(theme['bg'])
+
+    if layers["water"] is not None:
+        layers["water"].set_facecolor(theme['water'])
+    if layers["parks"] is not None:
+        layers["parks"].set_facecolor(theme['parks'])
+
+    layers["roads"].set_color(get_road_colors(layers["road_classes"], theme))
+
+    for image, location in layers["gradients"]:
+        image.set_cmap(get_gradient_cmap(theme['gradient_color'], location))
+
+    for artist in layers["text"]:
+        artist.set_color(theme['text'])
+
+
+def get_save_kwargs(output_format, theme, dpi=DPI, layout=LAYOUT, pad_inches=0.05):
+    """
+    savefig() options shared by every export path.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout '{layout}' (use {' or '.join(LAYOUTS)})")
+    save_kwargs = dict(format=output_format, facecolor=theme["bg"])
+    if layout == "tight":
+        # Measures the drawn extent first, so the figure is drawn twice
+        save_kwargs.update(bbox_inches="tight", pad_inches=pad_inches)
 
     # DPI matters mainly for raster formats
-    if fmt == "png":
-        save_kwargs["dpi"] = 300
+    if output_format == "png":
+        save_kwargs["dpi"] = dpi
+    return save_kwargs
 
-    plt.savefig(output_file, format=fmt, **save_kwargs)
 
-    plt.close()
-    print(f"✓ Done! Poster saved as {output_file}")
+def get_strip_rows(width, height, dpi=DPI, strip_rows=None):
+    """
+    Rows per strip for tiled PNG rendering, or 0 to draw the canvas whole.
+    strip_rows of None renders in strips only beyond MAX_CANVAS_PIXELS.
+    """
+    if strip_rows is not None:
+        return strip_rows
+    return STRIP_ROWS if width * height * dpi ** 2 > MAX_CANVAS_PIXELS else 0
+
+
+def encode_pickled_figure(fig_bytes, output_format, save_kwargs):
+    """
+    Encodes a pickled figure in a worker process. Returns the file bytes.
+    """
+    import io
+    import pickle
+    fig = pickle.loads(fig_bytes)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, **save_kwargs)
+    return buffer.getvalue()
+
+
+_EXPORT_POOL = None
+_EXPORT_POOL_LOCK = threading.Lock()
+
+
+def get_export_pool():
+    """
+    Process pool for parallel exports, started on first use and kept for
+    later posters, since spawning a worker costs more than one encode.
+    """
+    global _EXPORT_POOL
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    with _EXPORT_POOL_LOCK:
+        if _EXPORT_POOL is None:
+            # spawn: fetch threads may be running, which fork does not copy safely
+            _EXPORT_POOL = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        return _EXPORT_POOL
+
+
+def export_poster(fig, output_formats, theme, outputs=None, dpi=DPI, parallel=False, layout=LAYOUT, pad_inches=0.05, strip_rows=None, strip_workers=1):
+    """
+    Encodes one rendered figure to several formats, back to back, without
+    rebuilding the scene. outputs maps a format to a path or a writable
+    file-like object; formats without one are returned as bytes.
+
+    With parallel=True the vector formats are encoded from a pickled copy
+    of the figure in a worker process while PNG is encoded here. Figures
+    that cannot be pickled are encoded sequentially.
+
+    layout is "exact" (one draw, width*dpi x height*dpi pixels) or "tight"
+    (cropped to the drawn extent plus pad_inches, drawn twice).
+
+    Large exact-layout PNGs are rendered in strips of strip_rows rows (see
+    get_strip_rows), on strip_workers processes.
+    """
+    import io
+    import pickle
+    outputs = outputs or {}
+    output_formats = [fmt.lower() for fmt in output_formats]
+    save_kwargs = {fmt: get_save_kwargs(fmt, theme, dpi, layout, pad_inches) for fmt in output_formats}
+    # Strips tile the uncropped figure, so they need the exact layout
+    strip_rows = get_strip_rows(*fig.get_size_inches(), dpi, strip_rows) if layout == "exact" else 0
+    results = {}
+
+    def write(fmt, data):
+        if outputs.get(fmt) is None:
+            results[fmt] = data
+        else:
+            write_output(outputs[fmt], data)
+
+    futures = {}
+    fig_bytes = None
+    if parallel and len(output_formats) > 1:
+        try:
+            fig_bytes = pickle.dumps(fig)
+        except Exception as e:
+            # e.g. artists from GeoDataFrame.plot(); encode everything here instead
+            print(f"⚠ Figure cannot be pickled, exporting sequentially: {e}")
+    if fig_bytes is not None:
+        pool = get_export_pool()
+        for fmt in output_formats:
+            if fmt != "png":
+                futures[fmt] = pool.submit(encode_pickled_figure, fig_bytes, fmt, save_kwargs[fmt])
+
+    # Layers are drawn inside savefig(); only looked up when profiling
+    draw_stages = get_draw_stages(fig) if profiling.enabled() else {}
+    for fmt in output_formats:
+        if fmt in futures:
+            continue
+        target = outputs.get(fmt)
+        buffer = io.BytesIO() if target is None else None
+        # Stream straight into the target, no intermediate copy
+        out = target if buffer is None else buffer
+        with profiling.stage(f"save.{fmt}", strips=bool(fmt == "png" and strip_rows)) as info, \
+                profiling.trace_draw(draw_stages):
+            if fmt == "png" and strip_rows:
+                from tiled_render import write_png_strips
+                write_png_strips(fig, out, dpi, theme["bg"], strip_rows, strip_workers)
+            else:
+                fig.savefig(out, **save_kwargs[fmt])
+            if buffer is not None:
+                results[fmt] = buffer.getvalue()
+                info["bytes"] = len(results[fmt])
+            elif isinstance(target, (str, os.PathLike)):
+                info["bytes"] = os.path.getsize(target)
+
+    for fmt, future in futures.items():
+        # Encoded in the worker; this measures the wait for it
+        with profiling.stage(f"save.{fmt}", worker=True) as info:
+            data = future.result()
+            info["bytes"] = len(data)
+        write(fmt, data)
+    return results
+
+
+def save_poster(fig, output_file, output_format, theme, dpi=DPI, layout=LAYOUT):
+    """
+    Saves a rendered poster figure to a path or a writable file-like object.
+    """
+    name = output_file if isinstance(output_file, (str, os.PathLike)) else "buffer"
+    print(f"Saving to {name}...")
+    export_poster(fig, [output_format], theme, {output_format.lower(): output_file}, dpi, layout=layout)
+    print(f"✓ Done! Poster saved as {name}")
+
+
+def create_poster(city, country, point, dist, output_file=None, output_format="png", width=12, height=16, country_label=None, name_label=None, theme=None, dpi=DPI, parallel=False, layout=LAYOUT, strip_rows=None, strip_workers=1, reuse_base=True, preview=None):
+    """
+    Renders a poster once and exports it to every requested format.
+
+    output_format is a format or a list of formats. output_file is a path
+    or file-like object (one format), a dict mapping formats to paths or
+    file-like objects, or None. Returns a dict with the bytes of every
+    format that had no output. Large PNGs are rendered in strips, see
+    export_poster().
+
+    With reuse_base the map area is cached (see get_base_layer), so
+    posters that only differ in their labels just draw the text.
+
+    preview(png_bytes) is called with a quick low-resolution preview (see
+    render_preview) as soon as the map data is ready, before the full
+    render starts. A cached map area needs no preview and skips it.
+    """
+    print(f"\nGenerating map for {city}, {country}...")
+    theme = theme or THEME
+    output_formats = [output_format] if isinstance(output_format, str) else list(output_format)
+
+    def on_scene(scene):
+        if preview is not None:
+            preview(render_preview(scene, theme, city, country, country_label=country_label, name_label=name_label))
+
+    if reuse_base:
+        # Plain PNGs composite the cached raster; vector output and strip
+        # rendering need the figure itself
+        raster = ([fmt.lower() for fmt in output_formats] == ["png"] and layout == "exact"
+                  and not get_strip_rows(width, height, dpi, strip_rows))
+        base = get_base_layer(point, dist, width, height, dpi, theme, raster, on_scene)
+        if raster:
+            print("Exporting png...")
+            png = composite_labels(base, width, height, dpi, theme, city, country, point,
+                                   country_label=country_label, name_label=name_label)
+            target = (output_file if isinstance(output_file, dict) else {"png": output_file}).get("png")
+            if target is None:
+                print("✓ Done! Encoded png in memory")
+                return {"png": png}
+            write_output(target, png)
+            print(f"✓ Done! Poster saved as {target}")
+            return {}
+        fig, ax = base
+        draw_labels(ax, point, width, theme, city, country, country_label=country_label, name_label=name_label)
+    else:
+        scene = prepare_scene(point, dist, width, height, dpi)
+        on_scene(scene)
+        fig, _ = render_scene(scene, theme, city, country, country_label=country_label, name_label=name_label)
+
+    # 5. Save
+    if output_file is None or isinstance(output_file, dict):
+        outputs = output_file
+    else:
+        outputs = {output_formats[0].lower(): output_file}
+    print(f"Exporting {', '.join(output_formats)}...")
+    results = export_poster(fig, output_formats, theme, outputs, dpi, parallel=parallel, layout=layout,
+                            strip_rows=strip_rows, strip_workers=strip_workers)
+    for target in (outputs or {}).values():
+        if isinstance(target, (str, os.PathLike)):
+            print(f"✓ Done! Poster saved as {target}")
+    if results:
+        print(f"✓ Done! Encoded {', '.join(results)} in memory")
+    return results
 
 
 def print_examples():
@@ -632,6 +1694,11 @@ def list_themes():
         print()
 
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["warm"]:
+        # python create_map_poster.py warm cities.txt ... (see warm_cache.py)
+        from warm_cache import main as warm_main
+        sys.exit(warm_main(sys.argv[2:]))
+
     parser = argparse.ArgumentParser(
         description="Generate beautiful map posters for any city",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -646,14 +1713,23 @@ Examples:
     
     parser.add_argument('--city', '-c', type=str, help='City name')
     parser.add_argument('--country', '-C', type=str, help='Country name')
+    parser.add_argument('--name', dest='name_label', type=str, help='Override city name displayed on poster')
     parser.add_argument('--country-label', dest='country_label', type=str, help='Override country text displayed on poster')
     parser.add_argument('--theme', '-t', type=str, default='feature_based', help='Theme name (default: feature_based)')
     parser.add_argument('--all-themes', '--All-themes', dest='all_themes', action='store_true', help='Generate posters for all themes')
     parser.add_argument('--distance', '-d', type=int, default=29000, help='Map radius in meters (default: 29000)')
     parser.add_argument('--width', '-W', type=float, default=12, help='Image width in inches (default: 12)')
     parser.add_argument('--height', '-H', type=float, default=16, help='Image height in inches (default: 16)')
+    parser.add_argument('--dpi', type=int, default=DPI, help=f'Output resolution; also sets the level of detail (default: {DPI})')
+    parser.add_argument('--layout', default=LAYOUT, choices=LAYOUTS, help=f'exact: width x height x dpi pixels, drawn once; tight: legacy cropped layout (default: {LAYOUT})')
+    parser.add_argument('--strip-rows', type=int, help=f'Render PNGs in strips of this many rows to bound memory; 0 disables (default: strips of {STRIP_ROWS} beyond {MAX_CANVAS_PIXELS // 1_000_000} megapixels)')
+    parser.add_argument('--strip-workers', type=int, default=1, help='Processes rendering PNG strips (default: 1)')
+    parser.add_argument('--osm-file', help='Read map data from a local OSM extract (.osm, .osm.bz2, .osm.pbf) instead of Overpass')
     parser.add_argument('--list-themes', action='store_true', help='List all available themes')
-    parser.add_argument('--format', '-f', default='png', choices=['png', 'svg', 'pdf'],help='Output format for the poster (default: png)')
+    parser.add_argument('--cache-stats', action='store_true', help='Show cache usage per namespace')
+    parser.add_argument('--preview', action='store_true', help=f'Write a quick {PREVIEW_DPI} DPI preview (*_preview.png) before the full render')
+    parser.add_argument('--profile', metavar='TRACE', help='Time every stage and write a Chrome trace (JSON) to this file')
+    parser.add_argument('--format', '-f', nargs='+', default=['png'], choices=['png', 'svg', 'pdf'], help='Output format(s) for the poster, e.g. -f png svg (default: png)')
     
     args = parser.parse_args()
     
@@ -666,12 +1742,22 @@ Examples:
     if args.list_themes:
         list_themes()
         sys.exit(0)
+
+    if args.cache_stats:
+        print_cache_stats()
+        sys.exit(0)
     
     # Validate required arguments
     if not args.city or not args.country:
         print("Error: --city and --country are required.\n")
         print_examples()
         sys.exit(1)
+
+    if args.osm_file:
+        if not os.path.exists(args.osm_file):
+            print(f"Error: OSM extract '{args.osm_file}' not found.")
+            sys.exit(1)
+        use_osm_extract(args.osm_file)
     
     available_themes = get_available_themes()
     if not available_themes:
@@ -691,13 +1777,45 @@ Examples:
     print("City Map Poster Generator")
     print("=" * 50)
     
+    # Every stage from here on is recorded for --profile
+    records = profiling.start_recording() if args.profile else None
+
     # Get coordinates and generate poster
     try:
         coords = get_coordinates(args.city, args.country)
-        for theme_name in themes_to_generate:
-            THEME = load_theme(theme_name)
-            output_file = generate_output_filename(args.city, theme_name, args.format)
-            create_poster(args.city, args.country, coords, args.distance, output_file, args.format, args.width, args.height, country_label=args.country_label)
+        export_options = dict(dpi=args.dpi, parallel=len(args.format) > 1, layout=args.layout,
+                              strip_rows=args.strip_rows, strip_workers=args.strip_workers)
+
+        if len(themes_to_generate) == 1:
+            # One theme: reuses the cached map layer, so label variants are quick
+            THEME = load_theme(themes_to_generate[0])
+            outputs = {fmt: generate_output_filename(args.city, themes_to_generate[0], fmt) for fmt in args.format}
+            preview = partial(save_preview, preview_filename(outputs)) if args.preview else None
+            create_poster(args.city, args.country, coords, args.distance, outputs, list(outputs), args.width, args.height,
+                          country_label=args.country_label, name_label=args.name_label, theme=THEME, preview=preview,
+                          **export_options)
+        else:
+            print(f"\nGenerating map for {args.city}, {args.country}...")
+            # Fetch and project once; every theme only restyles the same figure
+            scene = prepare_scene(coords, args.distance, args.width, args.height, args.dpi)
+            if args.preview:
+                # One preview, in the first theme, to check the framing
+                path = preview_filename({"png": generate_output_filename(args.city, themes_to_generate[0], "png")})
+                save_preview(path, render_preview(scene, load_theme(themes_to_generate[0]), args.city, args.country,
+                                                  country_label=args.country_label, name_label=args.name_label))
+            fig = layers = None
+            for theme_name in themes_to_generate:
+                THEME = load_theme(theme_name)
+                if fig is None:
+                    fig, layers = render_scene(scene, THEME, args.city, args.country,
+                                               country_label=args.country_label, name_label=args.name_label)
+                else:
+                    apply_theme(fig, layers, THEME)
+                # Every format is encoded from the same figure; vector formats in parallel
+                outputs = {fmt: generate_output_filename(args.city, theme_name, fmt) for fmt in args.format}
+                print(f"Saving to {', '.join(outputs.values())}...")
+                export_poster(fig, list(outputs), THEME, outputs, **export_options)
+                print(f"✓ Done! Poster saved as {', '.join(outputs.values())}")
         
         print("\n" + "=" * 50)
         print("✓ Poster generation complete!")
@@ -708,3 +1826,9 @@ Examples:
         import traceback
         traceback.print_exc()
         sys.exit(1)
+    finally:
+        if records is not None:
+            profiling.stop_recording(records)
+            profiling.print_summary(records)
+            profiling.write_chrome_trace(args.profile, records)
+            print(f"\n✓ Profile written to {args.profile} (open in chrome://tracing or ui.perfetto.dev)")
@@ -0,0 +1,375 @@
+"""
+Where map data comes from.
+
+fetch_graph() and fetch_features() ask a data source for the street
+network and the features inside a bounding box:
+
+- OverpassSource queries the Overpass API through osmnx (the default).
+- LocalExtractSource reads a local OSM extract (.osm, .osm.bz2 or, with
+  pyosmium installed, .osm.pbf). The extract is parsed once into arrays
+  of ways and relations with their bounding boxes; the index is cached,
+  and every query after that is an R-tree lookup at local disk speed,
+  with no network access.
+
+Both return what osmnx would build from an Overpass response, so the
+rest of the pipeline does not know the difference.
+"""
+import bz2
+import os
+import re
+import threading
+import xml.etree.ElementTree as ET
+from hashlib import md5
+
+# osmnx's network_type="all" filter: ways with a highway tag, minus these
+NETWORK_EXCLUDE = {
+    "area": re.compile("yes"),
+    "access": re.compile("private"),
+    "highway": re.compile("abandoned|construction|no|planned|platform|proposed|raceway|razed"),
+    "service": re.compile("private"),
+}
+
+# Relation types osmnx turns into (multi)polygons
+RELATION_TYPES = {"boundary", "multipolygon"}
+
+# Bump when the layout of OSMExtract changes; older cached indexes are rebuilt
+EXTRACT_INDEX_VERSION = 1
+
+
+class OverpassSource:
+    """
+    Downloads data from the Overpass API, one rate-limited request per call.
+    """
+
+    cache_tag = ""
+
+    def __init__(self, limiter=None):
+        self.limiter = limiter
+
+    def graph_from_bbox(self, bbox):
+        import osmnx as ox
+        if self.limiter is not None:
+            self.limiter.acquire()
+        return ox.graph_from_bbox(bbox=bbox, network_type='all', simplify=False, retain_all=True, truncate_by_edge=True)
+
+    def features_from_bbox(self, bbox, tags):
+        """
+        Returns the features matching tags, or an empty GeoDataFrame.
+        """
+        import osmnx as ox
+        from geopandas import GeoDataFrame
+        if self.limiter is not None:
+            self.limiter.acquire()
+        try:
+            return ox.features_from_bbox(bbox=bbox, tags=tags)
+        except ox._errors.InsufficientResponseError:
+            return GeoDataFrame(geometry=[], crs="EPSG:4326")
+
+
+def is_network_way(tags):
+    """
+    True for ways osmnx would download for network_type="all".
+    """
+    return "highway" in tags and not any(
+        key in tags and pattern.search(tags[key]) for key, pattern in NETWORK_EXCLUDE.items()
+    )
+
+
+def matches_tags(element_tags, tags):
+    """
+    True if an element matches any of the osmnx-style tags
+    ({key: True | value | [values]}).
+    """
+    for key, value in tags.items():
+        if key not in element_tags:
+            continue
+        if value is True:
+            return True
+        if isinstance(value, str) and element_tags[key] == value:
+            return True
+        if isinstance(value, (list, tuple, set)) and element_tags[key] in value:
+            return True
+    return False
+
+
+class OSMExtract:
+    """
+    Ways and polygon relations of an OSM extract, with R-trees over their
+    bounding boxes. Ways keep their node ids and coordinates, so no node
+    table is needed.
+    """
+
+    def __init__(self, way_ids, way_offsets, way_refs, way_coords, way_tags, relation_ids, relation_tags, relation_members):
+        import numpy as np
+
+        # way_ids must be sorted, relation members are looked up by binary search
+        self.way_ids = way_ids
+        self.way_offsets = way_offsets
+        self.way_refs = way_refs
+        self.way_coords = way_coords
+        self.way_tags = way_tags
+        self.relation_ids = relation_ids
+        self.relation_tags = relation_tags
+        self.relation_members = relation_members
+
+        self.way_bounds = np.full((len(way_ids), 4), np.nan)
+        for i in range(len(way_ids)):
+            coords = way_coords[way_offsets[i]:way_offsets[i + 1]]
+            if len(coords):
+                self.way_bounds[i] = (*coords.min(axis=0), *coords.max(axis=0))
+
+        self.relation_bounds = np.full((len(relation_ids), 4), np.nan)
+        for i, members in enumerate(relation_members):
+            ways = self._way_indices([ref for kind, ref, _ in members if kind == "way"])
+            bounds = self.way_bounds[ways]
+            bounds = bounds[~np.isnan(bounds[:, 0])]
+            if len(bounds):
+                self.relation_bounds[i] = (*bounds[:, :2].min(axis=0), *bounds[:, 2:].max(axis=0))
+        self._trees = None
+
+    def __getstate__(self):
+        # The R-trees are rebuilt on load, which is quicker than unpickling them
+        state = dict(self.__dict__)
+        state["_trees"] = None
+        return state
+
+    def _way_indices(self, refs):
+        import numpy as np
+        if len(self.way_ids) == 0:
+            return np.empty(0, np.int64)
+        refs = np.asarray(refs, dtype=np.int64)
+        indices = np.searchsorted(self.way_ids, refs)
+        found = (indices < len(self.way_ids)) & (self.way_ids[np.minimum(indices, len(self.way_ids) - 1)] == refs)
+        return indices[found]
+
+    def _query(self, bbox):
+        """
+        Indices of ways and relations whose bounding boxes meet the bbox.
+        """
+        import numpy as np
+        import shapely
+        if self._trees is None:
+            trees = []
+            for bounds in (self.way_bounds, self.relation_bounds):
+                valid = np.flatnonzero(~np.isnan(bounds[:, 0]))
+                trees.append((shapely.STRtree(shapely.box(*bounds[valid].T)), valid))
+            self._trees = trees
+        north, south, east, west = bbox
+        box = shapely.box(west, south, east, north)
+        return [np.sort(valid[tree.query(box)]) for tree, valid in self._trees]
+
+    def _elements(self, way_indices, relation_indices=()):
+        """
+        Overpass-style JSON elements: the nodes of the ways, the ways, then
+        the relations, in the order Overpass returns them and osmnx expects.
+        """
+        ways = []
+        nodes = {}
+        for i in way_indices:
+            start, end = self.way_offsets[i], self.way_offsets[i + 1]
+            refs = self.way_refs[start:end]
+            for ref, (lon, lat) in zip(refs.tolist(), self.way_coords[start:end].tolist()):
+                nodes[ref] = (lat, lon)
+            ways.append({"type": "way", "id": int(self.way_ids[i]), "nodes": refs.tolist(), "tags": self.way_tags[i]})
+        elements = [{"type": "node", "id": ref, "lat": lat, "lon": lon} for ref, (lat, lon) in nodes.items()]
+        elements.extend(ways)
+        for i in relation_indices:
+            elements.append({
+                "type": "relation",
+                "id": int(self.relation_ids[i]),
+                "members": [{"type": kind, "ref": ref, "role": role} for kind, ref, role in self.relation_members[i]],
+                "tags": self.relation_tags[i],
+            })
+        return {"elements": elements}
+
+    def network_response(self, bbox):
+        ways, _ = self._query(bbox)
+        return self._elements([i for i in ways if is_network_way(self.way_tags[i])])
+
+    def features_response(self, bbox, tags):
+        import numpy as np
+        ways, relations = self._query(bbox)
+        ways = [i for i in ways if matches_tags(self.way_tags[i], tags)]
+        relations = [i for i in relations if matches_tags(self.relation_tags[i], tags)]
+        # Member ways of matching relations come along untagged or not, like Overpass' (._;>;)
+        members = [ref for i in relations for kind, ref, _ in self.relation_members[i] if kind == "way"]
+        ways = np.union1d(np.asarray(ways, dtype=np.int64), self._way_indices(members))
+        return self._elements(ways.tolist(), relations)
+
+
+class _ExtractBuilder:
+    """
+    Collects ways and relations while an extract is parsed.
+    """
+
+    def __init__(self):
+        self.way_ids, self.way_lengths, self.way_refs, self.way_coords, self.way_tags = [], [], [], [], []
+        self.relation_ids, self.relation_tags, self.relation_members = [], [], []
+
+    def add_way(self, way_id, refs, coords, tags):
+        self.way_ids.append(way_id)
+        self.way_lengths.append(len(refs))
+        self.way_refs.extend(refs)
+        self.way_coords.extend(coords)
+        self.way_tags.append(tags)
+
+    def add_relation(self, relation_id, members, tags):
+        if tags.get("type") in RELATION_TYPES:
+            self.relation_ids.append(relation_id)
+            self.relation_members.append(members)
+            self.relation_tags.append(tags)
+
+    def build(self):
+        import numpy as np
+        way_ids = np.asarray(self.way_ids, dtype=np.int64)
+        order = np.argsort(way_ids, kind="stable")
+        lengths = np.asarray(self.way_lengths, dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+        refs = np.asarray(self.way_refs, dtype=np.int64)
+        coords = np.asarray(self.way_coords, dtype=np.float64).reshape(-1, 2)
+        if not np.all(order == np.arange(len(order))):
+            # Reorder ways by id, for binary search of relation members
+            pieces = [np.arange(offsets[i], offsets[i + 1]) for i in order]
+            take = np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.int64)
+            refs, coords = refs[take], coords[take]
+            lengths = lengths[order]
+            offsets = np.concatenate(([0], np.cumsum(lengths)))
+            way_ids = way_ids[order]
+            self.way_tags = [self.way_tags[i] for i in order]
+        return OSMExtract(way_ids, offsets, refs, coords, self.way_tags,
+                          np.asarray(self.relation_ids, dtype=np.int64), self.relation_tags, self.relation_members)
+
+
+def parse_osm_xml(path):
+    """
+    Parses an OSM XML extract (optionally bz2-compressed) into an OSMExtract.
+    Ways referring to nodes missing from the extract keep the nodes they have.
+    """
+    builder = _ExtractBuilder()
+    nodes = {}
+    opener = bz2.open if str(path).endswith(".bz2") else open
+    with opener(path, "rb") as f:
+        for _, element in ET.iterparse(f, events=("end",)):
+            if element.tag == "node":
+                nodes[int(element.get("id"))] = (float(element.get("lon")), float(element.get("lat")))
+            elif element.tag == "way":
+                refs = [int(nd.get("ref")) for nd in element.iter("nd")]
+                refs = [ref for ref in refs if ref in nodes]
+                tags = {tag.get("k"): tag.get("v") for tag in element.iter("tag")}
+                builder.add_way(int(element.get("id")), refs, [nodes[ref] for ref in refs], tags)
+            elif element.tag == "relation":
+                members = [(m.get("type"), int(m.get("ref")), m.get("role", "")) for m in element.iter("member")]
+                tags = {tag.get("k"): tag.get("v") for tag in element.iter("tag")}
+                builder.add_relation(int(element.get("id")), members, tags)
+            else:
+                continue
+            element.clear()
+    return builder.build()
+
+
+def parse_osm_pbf(path):
+    """
+    Parses an OSM PBF extract into an OSMExtract, using pyosmium.
+    """
+    try:
+        import osmium
+    except ImportError:
+        raise ValueError("PBF extracts need pyosmium: pip install osmium (or convert the extract to .osm)")
+
+    builder = _ExtractBuilder()
+    member_types = {"n": "node", "w": "way", "r": "relation"}
+
+    class Handler(osmium.SimpleHandler):
+        def way(self, way):
+            nodes = [node for node in way.nodes if node.location.valid()]
+            builder.add_way(way.id, [node.ref for node in nodes],
+                            [(node.location.lon, node.location.lat) for node in nodes],
+                            {tag.k: tag.v for tag in way.tags})
+
+        def relation(self, relation):
+            builder.add_relation(relation.id,
+                                 [(member_types[m.type], m.ref, m.role) for m in relation.members],
+                                 {tag.k: tag.v for tag in relation.tags})
+
+    # locations=True resolves way node coordinates while reading
+    Handler().apply_file(str(path), locations=True)
+    return builder.build()
+
+
+class LocalExtractSource:
+    """
+    Serves map data from a local OSM extract. The parsed index is kept in
+    memory and, given a DiskCache, on disk for later processes.
+    """
+
+    def __init__(self, path, cache=None):
+        self.path = os.path.abspath(path)
+        if not os.path.exists(self.path):
+            raise ValueError(f"OSM extract not found: {path}")
+        stat = os.stat(self.path)
+        fingerprint = f"{self.path}:{stat.st_size}:{stat.st_mtime_ns}:{EXTRACT_INDEX_VERSION}"
+        # Keeps tiles from different extracts (and from Overpass) apart in the cache
+        self.cache_tag = "osm" + md5(fingerprint.encode()).hexdigest()[:8]
+        self.cache = cache
+        self._extract = None
+        self._lock = threading.Lock()
+
+    @property
+    def extract(self):
+        with self._lock:
+            if self._extract is None:
+                self._extract = self._load()
+            return self._extract
+
+    def _load(self):
+        key = f"extract_{self.cache_tag}"
+        if self.cache is not None:
+            extract = self.cache.get(key, "extracts")
+            if extract is not None:
+                print(f"✓ Using cached index of {os.path.basename(self.path)}")
+                return extract
+
+        print(f"Indexing {os.path.basename(self.path)} (once)...")
+        if self.path.endswith(".pbf"):
+            extract = parse_osm_pbf(self.path)
+        else:
+            extract = parse_osm_xml(self.path)
+        print(f"✓ Indexed {len(extract.way_ids):,} ways and {len(extract.relation_ids):,} relations")
+        if self.cache is not None:
+            try:
+                self.cache.set(key, extract, "extracts")
+            except Exception as e:
+                print(e)
+        return extract
+
+    def graph_from_bbox(self, bbox):
+        import osmnx as ox
+        response = self.extract.network_response(bbox)
+        if not response["elements"]:
+            raise ValueError("No streets in the extract for this area")
+        return ox.graph._create_graph([response], retain_all=True, bidirectional=False)
+
+    def features_from_bbox(self, bbox, tags):
+        """
+        Returns the features matching tags, or an empty GeoDataFrame.
+        """
+        import osmnx as ox
+        import shapely
+        from geopandas import GeoDataFrame
+        response = self.extract.features_response(bbox, tags)
+        if not response["elements"]:
+            return GeoDataFrame(geometry=[], crs="EPSG:4326")
+        north, south, east, west = bbox
+        try:
+            return ox.features._create_gdf([response], shapely.box(west, south, east, north), tags)
+        except ox._errors.InsufficientResponseError:
+            return GeoDataFrame(geometry=[], crs="EPSG:4326")
+
+
+def open_data_source(osm_extract=None, limiter=None, cache=None):
+    """
+    Returns a LocalExtractSource for a path, else an OverpassSource.
+    """
+    if osm_extract:
+        return LocalExtractSource(osm_extract, cache)
+    return OverpassSource(limiter)
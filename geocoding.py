@@ -0,0 +1,238 @@
+"""
+Geocoding with a local gazetteer.
+
+Places are looked up by a normalised key, so "New York, USA", "new york"
++ "United States" and "NEW  YORK" + "usa" all resolve to the same entry:
+
+1. the in-memory table of this process,
+2. the bundled seed list (gazetteer.csv), for instant lookups of
+   well-known cities,
+3. the persistent gazetteer in the cache's coords namespace,
+4. the geocoder, normally Nominatim, behind the Nominatim rate limit.
+
+Results from the geocoder go into the persistent gazetteer. Places the
+geocoder cannot find are cached as misses for NEGATIVE_TTL seconds, so a
+typo in a manifest does not cost a request on every run.
+
+The geocoder is any callable taking a "City, Country" query and returning
+(lat, lon, address) or None, which makes it easy to stub out.
+"""
+import asyncio
+import csv
+import os
+import re
+import threading
+import time
+import unicodedata
+
+# How long "not found" answers are trusted before asking again
+NEGATIVE_TTL = 24 * 3600
+
+CACHE_NAMESPACE = "coords"
+
+# Common alternative country names, normalised, mapped to one spelling
+COUNTRY_ALIASES = {
+    "usa": "united states",
+    "us": "united states",
+    "united states of america": "united states",
+    "uk": "united kingdom",
+    "great britain": "united kingdom",
+    "uae": "united arab emirates",
+    "czech republic": "czechia",
+    "slovenija": "slovenia",
+    "deutschland": "germany",
+    "espana": "spain",
+    "brasil": "brazil",
+    "italia": "italy",
+}
+
+
+def normalize_name(name):
+    """
+    Lowercases a name, strips accents and punctuation and collapses
+    whitespace: "  São-Paulo " -> "sao paulo".
+    """
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(ch for ch in name if not unicodedata.combining(ch))
+    name = re.sub(r"[^\w]+", " ", name.lower())
+    return " ".join(name.split())
+
+
+def split_place(city, country=None):
+    """
+    Splits "City, Country" queries and drops a country repeated in the
+    city field. Returns normalised (city, country).
+    """
+    if not country and "," in city:
+        city, country = city.rsplit(",", 1)
+    country = normalize_name(country or "")
+    country = COUNTRY_ALIASES.get(country, country)
+    if "," in city:
+        head, tail = city.rsplit(",", 1)
+        tail = normalize_name(tail)
+        if COUNTRY_ALIASES.get(tail, tail) == country:
+            city = head
+    return normalize_name(city), country
+
+
+def place_key(city, country=None):
+    """
+    Normalised gazetteer key of a place, e.g. "new-york_united-states".
+    """
+    city, country = split_place(city, country)
+    return f"{city.replace(' ', '-')}_{country.replace(' ', '-')}"
+
+
+def load_seed(path):
+    """
+    Reads a city,country,lat,lon CSV into {key: (lat, lon)}.
+    A missing file is an empty seed.
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        return {place_key(row["city"], row["country"]): (float(row["lat"]), float(row["lon"])) for row in csv.DictReader(f)}
+
+
+def geopy_geocode(geolocator, query):
+    """
+    Geocodes a query with a geopy geocoder. Returns (lat, lon, address)
+    or None when nothing was found.
+    """
+    location = geolocator.geocode(query)
+
+    # If geocode returned a coroutine in some environments, run it to get the result.
+    if asyncio.iscoroutine(location):
+        try:
+            location = asyncio.run(location)
+        except RuntimeError:
+            # If an event loop is already running, try using it to complete the coroutine.
+            loop = asyncio.get_event_loop()
+            if loop.is_running():
+                # Running event loop in the same thread; raise a clear error.
+                raise RuntimeError("Geocoder returned a coroutine while an event loop is already running. Run this script in a synchronous environment.")
+            location = loop.run_until_complete(location)
+
+    if not location:
+        return None
+    return location.latitude, location.longitude, getattr(location, "address", None)
+
+
+class Geocoder:
+    """
+    Resolves (city, country) to (lat, lon) through the gazetteer layers,
+    falling back to geocode(). cache is a DiskCache or None for a purely
+    in-memory gazetteer; limiter is acquired before every geocode() call.
+    """
+
+    def __init__(self, geocode, cache=None, limiter=None, seed=None, negative_ttl=NEGATIVE_TTL):
+        self.geocode = geocode
+        self.cache = cache
+        self.limiter = limiter
+        self.seed = load_seed(seed) if isinstance(seed, str) else dict(seed or {})
+        self.negative_ttl = negative_ttl
+        self._memory = {}
+        self._lock = threading.Lock()
+
+    def _cache_get(self, key):
+        if self.cache is None:
+            return None
+        return self.cache.get(f"coords_{key}", CACHE_NAMESPACE)
+
+    def _cache_set(self, key, value):
+        if self.cache is None:
+            return
+        from poster_cache import CacheError
+        try:
+            self.cache.set(f"coords_{key}", value, CACHE_NAMESPACE)
+        except CacheError as e:
+            print(e)
+
+    def lookup(self, city, country=None):
+        """
+        Returns the gazetteer entry for a place without geocoding: a
+        (lat, lon) tuple, a {"error": ..., "time": ...} miss, or None.
+        """
+        key = place_key(city, country)
+        with self._lock:
+            entry = self._memory.get(key)
+        if entry is None:
+            entry = self.seed.get(key) or self._cache_get(key)
+        if isinstance(entry, dict) and time.time() - entry["time"] > self.negative_ttl:
+            entry = None
+        with self._lock:
+            if entry is None:
+                self._memory.pop(key, None)
+            else:
+                self._memory[key] = entry
+        return entry
+
+    def add(self, city, country, lat, lon):
+        """
+        Stores a place in the persistent gazetteer.
+        """
+        key = place_key(city, country)
+        point = (float(lat), float(lon))
+        self._cache_set(key, point)
+        with self._lock:
+            self._memory[key] = point
+        return point
+
+    def resolve(self, city, country=None):
+        """
+        Returns (lat, lon) for a place. Raises ValueError when the place
+        cannot be found, now or within NEGATIVE_TTL of an earlier miss.
+        """
+        place = f"{city}, {country}" if country else city
+        entry = self.lookup(city, country)
+        if isinstance(entry, tuple):
+            print(f"✓ Using cached coordinates for {place}")
+            return entry
+        if entry is not None:
+            raise ValueError(f"Could not find coordinates for {place} ({entry['error']})")
+
+        print("Looking up coordinates...")
+        if self.limiter is not None:
+            self.limiter.acquire()
+        try:
+            found = self.geocode(place)
+        except Exception as e:
+            # Service errors are not cached; the next run asks again
+            raise ValueError(f"Geocoding failed for {place}: {e}")
+
+        key = place_key(city, country)
+        if not found:
+            miss = {"error": "not found", "time": time.time()}
+            self._cache_set(key, miss)
+            with self._lock:
+                self._memory[key] = miss
+            raise ValueError(f"Could not find coordinates for {place}")
+
+        lat, lon, address = found
+        print(f"✓ Found: {address}" if address else "✓ Found location (address not available)")
+        print(f"✓ Coordinates: {lat}, {lon}")
+        return self.add(city, country, lat, lon)
+
+    def resolve_many(self, places):
+        """
+        Resolves a list of (city, country) pairs. Spelling variants of one
+        place are geocoded once, and places already in the gazetteer never
+        wait for the rate limit. Returns {(city, country): (lat, lon) or
+        the ValueError raised for it}.
+        """
+        by_key = {}
+        for city, country in places:
+            by_key.setdefault(place_key(city, country), []).append((city, country))
+
+        # Known places first, so they are not held up behind geocoder requests
+        keys = sorted(by_key, key=lambda key: self.lookup(*by_key[key][0]) is None)
+        results = {}
+        for key in keys:
+            city, country = by_key[key][0]
+            try:
+                result = self.resolve(city, country)
+            except ValueError as e:
+                result = e
+            for place in by_key[key]:
+                results[place] = result
+        return results
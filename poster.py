@@ -1,6 +1,7 @@
 import matplotlib.pyplot as plt
 import osmnx as ox
 from pathlib import Path
+from create_map_poster import classify_roads, configure_osmnx, get_coordinates, lookup_by_road_class
 
 # Nastavitev mape za shranjevanje
 output_dir = Path("posters")
@@ -16,6 +17,9 @@ THEMES = {
     "ink": {"bg": "#ffffff", "water": "#e0e0e0", "hway": "#000000", "prim": "#333333", "other": "#999999", "txt": "#000000"}
 }
 
+# Debeline cest po razredu (ostale ceste 0.8)
+ROAD_WIDTHS = {"motorway": 2.5, "trunk": 2.5, "primary": 1.5, "secondary": 1.5}
+
 def create_all_posters():
     print("\n" + "="*40)
     print("   GENERATOR VSEH 6 TEM (Full Power)")
@@ -32,17 +36,20 @@ def create_all_posters():
     print(f"\n>>> Pridobivam podatke za {place}...")
     
     try:
-        # Pridobivanje podatkov o mestu in koordinat
-        gdf = ox.geocode_to_gdf(place)
-        lat, lon = gdf.iloc[0]['lat'], gdf.iloc[0]['lon']
+        # Pridobivanje koordinat (enkrat, iz skupnega gazetteerja) in podatkov okoli njih
+        lat, lon = get_coordinates(city, country)
         coords = f"{abs(lat):.4f}° {'N' if lat>0 else 'S'} / {abs(lon):.4f}° {'E' if lon>0 else 'W'}"
-        graph = ox.graph_from_address(place, dist=dist, network_type="all")
+        configure_osmnx()
+        graph = ox.graph_from_point((lat, lon), dist=dist, network_type="all")
         
         try:
-            water = ox.features_from_address(place, tags={"natural": ["water", "coastline", "bay"], "waterway": True}, dist=dist)
+            water = ox.features_from_point((lat, lon), tags={"natural": ["water", "coastline", "bay"], "waterway": True}, dist=dist)
         except:
             water = None
 
+        # Razvrstitev cest samo enkrat za vse teme
+        road_classes = classify_roads(graph)
+
         # Zanka, ki gre skozi vseh 6 tem
         for name, colors in THEMES.items():
             print(f"    -> Delam temo: {name.upper()}")
@@ -57,15 +64,11 @@ def create_all_posters():
                 water.plot(ax=ax, color=colors["water"], zorder=1)
 
             # 2. Priprava debeline cest glede na tip
-            c_list, w_list = [], []
-            for _, _, d in graph.edges(data=True):
-                h = str(d.get('highway', ''))
-                if 'motorway' in h or 'trunk' in h:
-                    c_list.append(colors["hway"]); w_list.append(2.5)
-                elif 'primary' in h or 'secondary' in h:
-                    c_list.append(colors["prim"]); w_list.append(1.5)
-                else:
-                    c_list.append(colors["other"]); w_list.append(0.8)
+            c_list = lookup_by_road_class(road_classes, {
+                "motorway": colors["hway"], "trunk": colors["hway"],
+                "primary": colors["prim"], "secondary": colors["prim"],
+            }, default=colors["other"])
+            w_list = lookup_by_road_class(road_classes, ROAD_WIDTHS, default=0.8)
             
             # 3. Izris cestnega omrežja
             ox.plot_graph(graph, ax=ax, node_size=0, edge_color=c_list, edge_linewidth=w_list, show=False, close=False)
@@ -0,0 +1,357 @@
+"""
+Bounded on-disk cache for map data.
+
+Entries are grouped by namespace (coords, graphs, features, ...), one
+directory each. Every entry is a data file plus a JSON metadata file with
+its size, creation time, osmnx version and cache schema version.
+
+Values are either pickled, or stored as named numpy arrays in a flat
+columnar file (see write_arrays) that is read back through memory mapping.
+
+- Writes go to a temporary file that is renamed into place, so readers
+  never see half-written data.
+- A lock file serialises renames and eviction across processes, so
+  parallel renders can share one cache directory.
+- When the cache grows past its byte budget, the least recently used
+  entries are removed.
+"""
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from importlib import metadata
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: renames stay atomic, but no cross-process lock
+    fcntl = None
+
+# Bump when the layout of cached values changes; older entries become misses
+SCHEMA_VERSION = 2
+
+# Temporary files older than this are left over from crashed writers
+STALE_TMP_SECONDS = 3600
+
+META_SUFFIX = ".meta.json"
+
+# Data file suffix per storage format
+DATA_SUFFIXES = {"pickle": ".pkl", "arrays": ".arrays"}
+
+ARRAYS_MAGIC = b"MPARRAY1"
+# Arrays start on multiples of this many bytes so they can be mapped directly
+ARRAYS_ALIGN = 64
+
+
+class CacheError(Exception):
+    """Raised when a cache operation fails."""
+    pass
+
+
+def write_arrays(f, arrays, attrs=None):
+    """
+    Writes named numpy arrays to a binary file: magic, header length,
+    JSON header (dtype, shape and offset of every array, plus attrs),
+    then the raw array data, each block aligned to ARRAYS_ALIGN bytes.
+    """
+    import numpy as np
+
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += -(-array.nbytes // ARRAYS_ALIGN) * ARRAYS_ALIGN
+    header = json.dumps({"arrays": layout, "attrs": attrs or {}}).encode()
+
+    start = len(ARRAYS_MAGIC) + 8 + len(header)
+    start = -(-start // ARRAYS_ALIGN) * ARRAYS_ALIGN
+    f.write(ARRAYS_MAGIC)
+    f.write(len(header).to_bytes(8, "little"))
+    f.write(header)
+    f.write(b"\0" * (start - len(ARRAYS_MAGIC) - 8 - len(header)))
+    for name, array in arrays.items():
+        f.write(array.tobytes())
+        f.write(b"\0" * (-array.nbytes % ARRAYS_ALIGN))
+
+
+def read_arrays(path):
+    """
+    Memory-maps the arrays of a file written by write_arrays.
+    Returns (arrays, attrs); arrays are read-only and loaded on access.
+    """
+    import numpy as np
+
+    with open(path, "rb") as f:
+        if f.read(len(ARRAYS_MAGIC)) != ARRAYS_MAGIC:
+            raise ValueError(f"{path} is not an arrays file")
+        header_len = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(header_len))
+    start = -(-(len(ARRAYS_MAGIC) + 8 + header_len) // ARRAYS_ALIGN) * ARRAYS_ALIGN
+
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        shape = tuple(spec["shape"])
+        if 0 in shape:
+            # np.memmap cannot map zero bytes
+            arrays[name] = np.empty(shape, dtype=spec["dtype"])
+        else:
+            arrays[name] = np.memmap(path, dtype=spec["dtype"], mode="r", offset=start + spec["offset"], shape=shape)
+    return arrays, header["attrs"]
+
+
+def _package_version(name):
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def _load_pickle(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+class DiskCache:
+    """
+    Size-bounded, process-safe cache of pickled values and array sets.
+    max_bytes of None disables eviction.
+    """
+
+    def __init__(self, root, max_bytes=None, schema_version=SCHEMA_VERSION):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.schema_version = schema_version
+        self.osmnx_version = _package_version("osmnx")
+        self._counters = {}
+        self._counters_lock = threading.Lock()
+
+    def _paths(self, key, namespace, fmt="pickle"):
+        safe = key.replace(os.sep, "_")
+        directory = self.root / namespace
+        return directory / f"{safe}{DATA_SUFFIXES[fmt]}", directory / f"{safe}{META_SUFFIX}"
+
+    def _count(self, namespace, counter, n=1):
+        with self._counters_lock:
+            counters = self._counters.setdefault(
+                namespace, {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+            )
+            counters[counter] += n
+
+    @contextmanager
+    def _locked(self, exclusive):
+        """
+        Holds the cache-wide lock. Readers share it, writers and eviction
+        take it exclusively.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / ".lock", "a+") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _is_current(self, meta):
+        return (
+            meta.get("schema_version") == self.schema_version
+            and meta.get("osmnx_version") == self.osmnx_version
+        )
+
+    def get(self, key, namespace="default"):
+        """
+        Returns the cached value, or None on a miss.
+        Entries written by another schema or osmnx version count as misses.
+        """
+        return self._get(key, namespace, "pickle", _load_pickle)
+
+    def get_arrays(self, key, namespace="default"):
+        """
+        Returns (arrays, attrs) stored by set_arrays, or None on a miss.
+        The arrays are memory-mapped, so only the pages used are read.
+        """
+        return self._get(key, namespace, "arrays", read_arrays)
+
+    def _get(self, key, namespace, fmt, load):
+        data_path, meta_path = self._paths(key, namespace, fmt)
+        with self._locked(exclusive=False):
+            try:
+                with open(meta_path, "r") as f:
+                    meta = json.load(f)
+                if self._is_current(meta) and meta.get("format", "pickle") == fmt:
+                    value = load(data_path)
+                    # The data file's mtime is the entry's last use, for LRU eviction
+                    os.utime(data_path)
+                    self._count(namespace, "hits")
+                    return value
+            except FileNotFoundError:
+                self._count(namespace, "misses")
+                return None
+            except Exception as e:
+                print(f"⚠ Discarding unreadable cache entry {key}: {e}")
+
+        # Outdated or unreadable entry
+        self.delete(key, namespace)
+        self._count(namespace, "misses")
+        return None
+
+    def set(self, key, value, namespace="default"):
+        """
+        Stores a value atomically, then evicts old entries if over budget.
+        """
+        self._set(key, namespace, "pickle", lambda f: pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def set_arrays(self, key, arrays, attrs=None, namespace="default"):
+        """
+        Stores named numpy arrays plus JSON-serialisable attrs in the
+        columnar format, for memory-mapped reads through get_arrays.
+        """
+        self._set(key, namespace, "arrays", lambda f: write_arrays(f, arrays, attrs))
+
+    def _set(self, key, namespace, fmt, write):
+        data_path, meta_path = self._paths(key, namespace, fmt)
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_paths = []
+        try:
+            tmp_data = self._write_tmp(data_path, write)
+            tmp_paths.append(tmp_data)
+            meta = {
+                "key": key,
+                "namespace": namespace,
+                "format": fmt,
+                "size": os.path.getsize(tmp_data),
+                "created": time.time(),
+                "osmnx_version": self.osmnx_version,
+                "schema_version": self.schema_version,
+            }
+            tmp_meta = self._write_tmp(meta_path, lambda f: f.write(json.dumps(meta).encode()))
+            tmp_paths.append(tmp_meta)
+
+            with self._locked(exclusive=True):
+                # Drop a previous entry stored in the other format
+                for other in DATA_SUFFIXES.values():
+                    other_path = data_path.with_suffix(other)
+                    if other_path != data_path and other_path.exists():
+                        os.remove(other_path)
+                os.replace(tmp_data, data_path)
+                os.replace(tmp_meta, meta_path)
+                tmp_paths.clear()
+                self._count(namespace, "writes")
+                self._evict_locked(keep=data_path)
+        except Exception as e:
+            raise CacheError(f"Cache write failed: {e}")
+        finally:
+            for path in tmp_paths:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _write_tmp(path, write):
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-", suffix=path.suffix)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+                f.flush()
+                os.fsync(f.fileno())
+        except BaseException:
+            os.remove(tmp)
+            raise
+        return tmp
+
+    def delete(self, key, namespace="default"):
+        with self._locked(exclusive=True):
+            for fmt in DATA_SUFFIXES:
+                self._remove_entry(*self._paths(key, namespace, fmt))
+
+    @staticmethod
+    def _remove_entry(data_path, meta_path):
+        # Metadata first: an entry without metadata is never read.
+        # Memory-mapped readers keep their view of a removed file.
+        for path in (meta_path, data_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _entries(self):
+        """
+        Yields (namespace, data_path, meta_path, size, last_used) for every entry.
+        """
+        if not self.root.exists():
+            return
+        now = time.time()
+        for directory in self.root.iterdir():
+            if not directory.is_dir():
+                continue
+            for path in directory.iterdir():
+                if path.name.startswith(".tmp-"):
+                    try:
+                        if now - path.stat().st_mtime > STALE_TMP_SECONDS:
+                            os.remove(path)
+                    except OSError:
+                        pass
+                    continue
+                if not path.name.endswith(META_SUFFIX):
+                    continue
+                stem = path.name[:-len(META_SUFFIX)]
+                for suffix in DATA_SUFFIXES.values():
+                    data_path = path.with_name(stem + suffix)
+                    try:
+                        stat = data_path.stat()
+                    except FileNotFoundError:
+                        continue
+                    yield directory.name, data_path, path, stat.st_size, stat.st_mtime
+                    break
+
+    def _evict_locked(self, keep=None):
+        if self.max_bytes is None:
+            return
+        entries = sorted(self._entries(), key=lambda entry: entry[4])
+        total = sum(entry[3] for entry in entries)
+        for namespace, data_path, meta_path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if data_path == keep:
+                continue
+            self._remove_entry(data_path, meta_path)
+            self._count(namespace, "evictions")
+            total -= size
+
+    def evict(self):
+        """
+        Removes least recently used entries until the cache fits its budget.
+        """
+        with self._locked(exclusive=True):
+            self._evict_locked()
+
+    def clear(self, namespace=None):
+        """
+        Removes every entry, or only those of one namespace.
+        """
+        with self._locked(exclusive=True):
+            for entry_namespace, data_path, meta_path, _, _ in list(self._entries()):
+                if namespace is None or entry_namespace == namespace:
+                    self._remove_entry(data_path, meta_path)
+
+    def stats(self):
+        """
+        Returns per-namespace entry counts and sizes on disk, plus the
+        hit/miss/write/eviction counters of this process.
+        """
+        stats = {}
+        with self._locked(exclusive=False):
+            for namespace, _, _, size, _ in self._entries():
+                ns = stats.setdefault(namespace, {"entries": 0, "bytes": 0})
+                ns["entries"] += 1
+                ns["bytes"] += size
+        with self._counters_lock:
+            for namespace, counters in self._counters.items():
+                stats.setdefault(namespace, {"entries": 0, "bytes": 0}).update(counters)
+        return stats
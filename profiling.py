@@ -0,0 +1,286 @@
+"""
+Stage-level instrumentation.
+
+Code marks its stages with
+
+    with stage("fetch.graph") as info:
+        ...
+        info["edges"] = G.number_of_edges()
+
+and instant events such as cache hits with event("cache.hit", ...). Every
+stage records wall time, CPU time of its thread, peak RSS and whatever
+counts the code adds to info.
+
+Nothing is measured unless someone listens: either a recording (see
+record(), used by the CLI's --profile) or a hook registered with
+add_hook(), which embedding services use to feed their own metrics. A
+hook is called with the finished stage or event as a dict.
+
+Recordings are written as Chrome trace JSON (chrome://tracing, Perfetto),
+with a per-stage summary under "otherData".
+"""
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_hooks = []
+_recordings = []
+_lock = threading.Lock()
+_origin = time.perf_counter()
+
+
+def add_hook(hook):
+    """
+    Calls hook(record) for every finished stage and event from now on.
+    """
+    with _lock:
+        _hooks.append(hook)
+
+
+def remove_hook(hook):
+    with _lock:
+        if hook in _hooks:
+            _hooks.remove(hook)
+
+
+def enabled():
+    """True when a recording or a hook wants measurements."""
+    return bool(_hooks or _recordings)
+
+
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _emit(record):
+    with _lock:
+        hooks = list(_hooks)
+        for recording in _recordings:
+            recording.append(record)
+    for hook in hooks:
+        try:
+            hook(record)
+        except Exception as e:
+            # A broken hook must not fail the render
+            print(f"⚠ Profiling hook failed: {e}")
+
+
+@contextmanager
+def stage(name, **info):
+    """
+    Times the enclosed block as stage name. Yields the info dict, where
+    the block can add counts and sizes.
+    """
+    if not enabled():
+        yield info
+        return
+    started = time.perf_counter()
+    cpu_started = time.thread_time()
+    try:
+        yield info
+    finally:
+        ended = time.perf_counter()
+        _emit({
+            "type": "stage",
+            "name": name,
+            "start": started - _origin,
+            "wall": ended - started,
+            "cpu": time.thread_time() - cpu_started,
+            "peak_rss": peak_rss_bytes(),
+            "thread": threading.get_ident(),
+            "thread_name": threading.current_thread().name,
+            "info": info,
+        })
+
+
+def event(name, **info):
+    """
+    Records an instant event, e.g. a cache hit.
+    """
+    if not enabled():
+        return
+    _emit({
+        "type": "event",
+        "name": name,
+        "start": time.perf_counter() - _origin,
+        "thread": threading.get_ident(),
+        "thread_name": threading.current_thread().name,
+        "info": info,
+    })
+
+
+def start_recording():
+    """
+    Starts collecting every stage and event, from all threads, into the
+    returned list until stop_recording() is called with it.
+    """
+    records = []
+    with _lock:
+        _recordings.append(records)
+    return records
+
+
+def stop_recording(records):
+    with _lock:
+        if records in _recordings:
+            _recordings.remove(records)
+    return records
+
+
+@contextmanager
+def record():
+    """
+    Collects every stage and event of the enclosed block into the
+    yielded list, see start_recording().
+    """
+    records = start_recording()
+    try:
+        yield records
+    finally:
+        stop_recording(records)
+
+
+# Artists traced by trace_draw() calls in progress, {artist: stage name},
+# and the draw() each patched class had of its own, with how many of those
+# calls use the class
+_traced = {}
+_draw_originals = {}
+_draw_users = {}
+_draw_lock = threading.Lock()
+
+
+def _unpatched_draw(cls):
+    for klass in cls.__mro__:
+        if klass in _draw_originals:
+            if _draw_originals[klass] is not None:
+                return _draw_originals[klass]
+        elif "draw" in vars(klass):
+            return vars(klass)["draw"]
+    raise AttributeError(f"{cls.__name__} has no draw()")
+
+
+def _patch_draw(cls):
+    draw_original = _unpatched_draw(cls)
+
+    def draw(self, renderer, *args, **kwargs):
+        name = _traced.get(self)
+        if name is None:
+            return draw_original(self, renderer, *args, **kwargs)
+        with stage(name):
+            return draw_original(self, renderer, *args, **kwargs)
+
+    _draw_originals[cls] = vars(cls).get("draw")
+    cls.draw = draw
+
+
+def _unpatch_draw(cls):
+    original = _draw_originals.pop(cls)
+    if original is None:
+        del cls.draw
+    else:
+        cls.draw = original
+
+
+@contextmanager
+def trace_draw(artists):
+    """
+    Times the drawing of the given artists, {artist: stage name}, as
+    stages while the block runs. Drawing happens inside savefig(), so
+    this is the only way to see the cost of each layer. The artist
+    classes are patched while any trace_draw() block is running, so it
+    is only done when measurements are wanted; overlapping blocks in
+    other threads share the patch and the last one out removes it.
+    """
+    if not enabled() or not artists:
+        yield
+        return
+    classes = {type(artist) for artist in artists}
+    with _draw_lock:
+        _traced.update(artists)
+        for cls in classes:
+            if not _draw_users.get(cls):
+                _patch_draw(cls)
+            _draw_users[cls] = _draw_users.get(cls, 0) + 1
+    try:
+        yield
+    finally:
+        with _draw_lock:
+            for artist in artists:
+                if _traced.get(artist) == artists[artist]:
+                    del _traced[artist]
+            for cls in classes:
+                _draw_users[cls] -= 1
+                if not _draw_users[cls]:
+                    del _draw_users[cls]
+                    _unpatch_draw(cls)
+
+
+def summarize(records):
+    """
+    Per-stage totals: count, wall and CPU seconds, summed info counts.
+    """
+    summary = {}
+    for record in records:
+        entry = summary.setdefault(record["name"], {"count": 0, "wall": 0.0, "cpu": 0.0})
+        entry["count"] += 1
+        entry["wall"] += record.get("wall", 0.0)
+        entry["cpu"] += record.get("cpu", 0.0)
+        for key, value in record["info"].items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                entry[key] = entry.get(key, 0) + value
+    return summary
+
+
+def write_chrome_trace(path, records):
+    """
+    Writes records as Chrome trace JSON, with the summary in otherData.
+    """
+    pid = os.getpid()
+    trace = []
+    threads = {}
+    for record in records:
+        threads.setdefault(record["thread"], record["thread_name"])
+        entry = {
+            "name": record["name"],
+            "cat": record["name"].split(".", 1)[0],
+            "ts": round(record["start"] * 1e6, 1),
+            "pid": pid,
+            "tid": record["thread"],
+            "args": dict(record["info"]),
+        }
+        if record["type"] == "stage":
+            entry.update(ph="X", dur=round(record["wall"] * 1e6, 1))
+            entry["args"].update(cpu_ms=round(record["cpu"] * 1000, 3), peak_rss=record["peak_rss"])
+        else:
+            entry.update(ph="i", s="t")
+        trace.append(entry)
+    for tid, name in threads.items():
+        trace.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}})
+
+    with open(path, "w") as f:
+        json.dump({"traceEvents": trace, "displayTimeUnit": "ms", "otherData": {"stages": summarize(records)}}, f, indent=1, default=str)
+
+
+def print_summary(records):
+    summary = summarize(records)
+    peak = max((r["peak_rss"] or 0 for r in records if r["type"] == "stage"), default=0)
+    print(f"\n{'Stage':<24} {'Count':>6} {'Wall':>10} {'CPU':>10}")
+    print("-" * 53)
+    for name, entry in sorted(summary.items(), key=lambda item: item[1]["wall"], reverse=True):
+        wall = f"{entry['wall'] * 1000:.1f}ms" if entry["wall"] else "-"
+        cpu = f"{entry['cpu'] * 1000:.1f}ms" if entry["cpu"] else "-"
+        print(f"{name:<24} {entry['count']:>6} {wall:>10} {cpu:>10}")
+    if peak:
+        print(f"\nPeak RSS: {peak / 1024**2:.0f} MB")
@@ -0,0 +1,215 @@
+"""
+Persistent poster render service.
+
+Keeps the geo/plotting stack, fonts, parsed themes and recently used
+scenes in memory, so repeat cities only pay for rendering. Jobs are
+submitted over a small local HTTP/JSON API and rendered by a worker pool.
+
+  POST /jobs              {"city": ..., "country": ..., "theme": ..., ...} -> {"id": ..., "status": "queued"}
+  GET  /jobs/<id>         job status, timings and error
+  GET  /jobs/<id>/result  the rendered poster
+  GET  /themes            available theme names
+  GET  /health            pool, scene cache and job counts
+
+Usage:
+  python render_service.py [--host 127.0.0.1] [--port 8000] [--workers 2] [--scenes 8] [--scene-memory 1024]
+"""
+import argparse
+import io
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import create_map_poster as cmp
+from scene_cache import SceneCache
+
+CONTENT_TYPES = {"png": "image/png", "svg": "image/svg+xml", "pdf": "application/pdf"}
+
+# Finished jobs kept for polling; older ones are dropped with their results
+MAX_FINISHED_JOBS = 200
+
+
+class RenderService:
+    """
+    Job queue, worker pool and warm state behind the HTTP API.
+    """
+
+    def __init__(self, workers=2, max_scenes=8, scene_memory_mb=None):
+        self.themes = {name: cmp.load_theme(name) for name in cmp.get_available_themes()}
+        self.scenes = SceneCache(max_scenes, scene_memory_mb * 1024**2 if scene_memory_mb else None)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render")
+        self.workers = workers
+        self.jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, request):
+        """
+        Validates a job request and queues it. Returns a snapshot of the
+        job record.
+        """
+        if not isinstance(request, dict):
+            raise ValueError("request must be a JSON object")
+        job = {
+            "city": request.get("city"),
+            "country": request.get("country"),
+            "theme": request.get("theme", "feature_based"),
+            "distance": int(request.get("distance", 29000)),
+            "width": float(request.get("width", 12)),
+            "height": float(request.get("height", 16)),
+            "format": str(request.get("format", "png")).lower(),
+            "dpi": int(request.get("dpi", cmp.DPI)),
+            "layout": request.get("layout", cmp.LAYOUT),
+            "country_label": request.get("country_label"),
+            "name_label": request.get("name_label"),
+        }
+        if not job["city"] or not job["country"]:
+            raise ValueError("city and country are required")
+        if job["theme"] not in self.themes:
+            raise ValueError(f"Theme '{job['theme']}' not found")
+        if job["format"] not in CONTENT_TYPES:
+            raise ValueError(f"Unsupported format '{job['format']}'")
+        if job["layout"] not in cmp.LAYOUTS:
+            raise ValueError(f"Unsupported layout '{job['layout']}'")
+        for field in ("distance", "width", "height", "dpi"):
+            if not job[field] > 0:
+                raise ValueError(f"{field} must be positive")
+
+        job.update(id=uuid.uuid4().hex, status="queued", submitted=time.time())
+        with self._lock:
+            self.jobs[job["id"]] = job
+            self._drop_old_jobs()
+            queued = dict(job)
+        self.pool.submit(self._run, job)
+        return queued
+
+    def _drop_old_jobs(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job["status"] in ("done", "failed")]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+    def get(self, job_id):
+        """
+        Snapshot of a job record, or None for an unknown job.
+        """
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def get_scene(self, point, job):
+        key = (point, job["distance"], job["width"], job["height"], job["dpi"])
+        return self.scenes.get_or_create(
+            key, lambda: cmp.prepare_scene(point, job["distance"], job["width"], job["height"], job["dpi"])
+        )
+
+    def _run(self, job):
+        with self._lock:
+            job["status"] = "running"
+        started = time.perf_counter()
+        finished = {}
+        try:
+            point = cmp.get_coordinates(job["city"], job["country"])
+            scene = self.get_scene(point, job)
+            finished["scene_seconds"] = round(time.perf_counter() - started, 3)
+
+            theme = self.themes[job["theme"]]
+            fig, _ = cmp.render_scene(scene, theme, job["city"], job["country"], country_label=job["country_label"],
+                                     name_label=job["name_label"])
+            buffer = io.BytesIO()
+            cmp.save_poster(fig, buffer, job["format"], theme, job["dpi"], job["layout"])
+            finished["result"] = buffer.getvalue()
+            status = "done"
+        except Exception as e:
+            finished["error"] = str(e)
+            status = "failed"
+        finished["seconds"] = round(time.perf_counter() - started, 3)
+        # Published at once, status last, so a poller never sees "done" without the result
+        with self._lock:
+            job.update(finished, status=status)
+
+    def health(self):
+        with self._lock:
+            statuses = [job["status"] for job in self.jobs.values()]
+        return {
+            "workers": self.workers,
+            "scenes": self.scenes.stats(),
+            "jobs": {status: statuses.count(status) for status in set(statuses)},
+        }
+
+
+def job_summary(job):
+    """Job record without the result bytes."""
+    return {k: v for k, v in job.items() if k != "result"}
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/jobs":
+                return self._send_json(404, {"error": "not found"})
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                job = service.submit(json.loads(self.rfile.read(length) or b"{}"))
+            except (ValueError, TypeError) as e:
+                return self._send_json(400, {"error": str(e)})
+            self._send_json(202, job_summary(job))
+
+        def do_GET(self):
+            parts = [p for p in self.path.split("/") if p]
+            if parts == ["health"]:
+                return self._send_json(200, service.health())
+            if parts == ["themes"]:
+                return self._send_json(200, sorted(service.themes))
+            if len(parts) in (2, 3) and parts[0] == "jobs":
+                job = service.get(parts[1])
+                if job is None:
+                    return self._send_json(404, {"error": "unknown job"})
+                if len(parts) == 2:
+                    return self._send_json(200, job_summary(job))
+                if parts[2] == "result":
+                    if job["status"] != "done":
+                        return self._send_json(409, {"error": f"job is {job['status']}"})
+                    self.send_response(200)
+                    self.send_header("Content-Type", CONTENT_TYPES[job["format"]])
+                    self.send_header("Content-Length", str(len(job["result"])))
+                    self.end_headers()
+                    self.wfile.write(job["result"])
+                    return
+            self._send_json(404, {"error": "not found"})
+
+    return Handler
+
+
+def serve(host="127.0.0.1", port=8000, workers=2, max_scenes=8, scene_memory_mb=None):
+    service = RenderService(workers, max_scenes, scene_memory_mb)
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    print(f"✓ Render service listening on http://{host}:{port} ({workers} workers)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.pool.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the poster render service")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on (default: 8000)")
+    parser.add_argument("--workers", type=int, default=2, help="Concurrent renders (default: 2)")
+    parser.add_argument("--scenes", type=int, default=8, help="Prepared scenes kept in memory (default: 8)")
+    parser.add_argument("--scene-memory", type=int, metavar="MB", help="Memory budget of the scene cache in MB (default: unbounded)")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.scenes, args.scene_memory)
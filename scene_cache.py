@@ -0,0 +1,120 @@
+"""
+In-memory LRU of prepared scenes, for long-running processes that render
+the same cities again and again.
+
+Concurrent requests for the same missing key are collapsed: the first
+one builds the scene, the others wait for it instead of fetching the
+same data again.
+"""
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# Rough per-geometry overhead of a shapely object on top of its coordinates
+GEOMETRY_BYTES = 100
+
+
+def estimate_bytes(value):
+    """
+    Approximate memory held by a scene or any nesting of dicts, lists,
+    numpy arrays, GeoDataFrames and bytes.
+    """
+    if isinstance(value, dict):
+        return sum(estimate_bytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_bytes(item) for item in value)
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if hasattr(value, "geometry") and hasattr(value, "columns"):
+        import shapely
+        coordinates = int(shapely.get_num_coordinates(value.geometry.array).sum())
+        return coordinates * 16 + len(value) * GEOMETRY_BYTES
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    return sys.getsizeof(value)
+
+
+class SceneCache:
+    """
+    Thread-safe LRU mapping a key to a scene from prepare_scene().
+    Bounded by max_entries and, when given, by max_bytes of estimated
+    scene memory (see estimate_bytes).
+    """
+
+    def __init__(self, max_entries=8, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._scenes = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.evictions = 0
+
+    def get_or_create(self, key, factory):
+        """
+        Returns the scene for key, calling factory() to build it on a miss.
+        While it is being built, other callers asking for the same key wait
+        for that result (or its exception) instead of building it again.
+        """
+        with self._lock:
+            if key in self._scenes:
+                self._scenes.move_to_end(key)
+                self.hits += 1
+                return self._scenes[key]
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = Future()
+                self.misses += 1
+                building = True
+            else:
+                self.shared += 1
+                building = False
+
+        if not building:
+            return pending.result()
+
+        try:
+            scene = factory()
+        except BaseException as e:
+            # Failures are not cached; the next request tries again
+            with self._lock:
+                del self._pending[key]
+            pending.set_exception(e)
+            raise
+
+        size = estimate_bytes(scene) if self.max_bytes is not None else 0
+        with self._lock:
+            del self._pending[key]
+            self._store(key, scene, size)
+        pending.set_result(scene)
+        return scene
+
+    def _store(self, key, scene, size):
+        if self.max_bytes is not None and size > self.max_bytes:
+            # Larger than the whole budget: served, but never kept
+            return
+        self._scenes[key] = scene
+        self._sizes[key] = size
+        self._bytes += size
+        while len(self._scenes) > self.max_entries or (self.max_bytes is not None and self._bytes > self.max_bytes):
+            old_key, _ = self._scenes.popitem(last=False)
+            self._bytes -= self._sizes.pop(old_key)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._scenes),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "shared": self.shared,
+                "evictions": self.evictions,
+                "in_flight": len(self._pending),
+            }
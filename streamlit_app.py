@@ -1,7 +1,12 @@
+import os
+
 import streamlit as st
-import io
-import osmnx as ox
-import matplotlib.pyplot as plt
+from create_map_poster import (PREVIEW_DPI, PREVIEW_ROAD_CLASSES, ROAD_CLASSES, export_poster, get_coordinates,
+                               get_crop_limits, get_feature_layer, get_road_layer, get_simplify_tolerance, import_geo_stack,
+                               draw_polygon_layer, lookup_by_road_class, simplify_polygons, simplify_road_layer,
+                               subset_road_layer)
+from geocoding import place_key
+from scene_cache import SceneCache
 
 # 1. NASTAVITVE STRANI
 st.set_page_config(page_title="MESTNA POEZIJA", page_icon="🎨", layout="centered")
@@ -17,76 +22,128 @@ TEME = {
     "Starinski papir": {"bg": "#f4f1ea", "water": "#a5c3cf", "text": "#333333", "ac": "#8B4513", "glavne": "#2F4F4F"}
 }
 
-# 3. CACHING - Da aplikacija ne crkne ob navalu (shrani zadnjih 20 iskanj)
-@st.cache_data(show_spinner="Ustvarjam vaš A4 poster (PNG + SVG)...", max_entries=20)
-def ustvari_poster_final(mesto, drzava, razdalja, ime_teme):
-    try:
-        # Pridobivanje koordinat
-        lat, lon = ox.geocode(f"{mesto}, {drzava}")
-        barve = TEME[ime_teme]
-        ox.settings.timeout = 300
-        
-        # Omejitev območja
-        north, south, east, west = ox.utils_geo.bbox_from_point((lat, lon), dist=razdalja)
+# 3. CACHING
+# Podatkovni sloj (koordinate, prenesene in projicirane ceste ter voda) je
+# skupen vsem sejam in ločen od izrisanih posterjev: menjava teme ne prenaša
+# podatkov znova. Enake hkratne zahteve počakajo na en sam prenos.
+A4 = (8.27, 11.69)
+# Zemljevid zaseda zgornjih 78 % strani, spodaj so napisi
+MAP_BOTTOM = 0.22
+VODA_TAGS = {
+    'natural': ['water', 'bay', 'strait'],
+    'waterway': ['riverbank', 'dock', 'canal'],
+    'place': 'sea'
+}
+# Pomnilniški proračun podatkovnega sloja
+DATA_CACHE_MB = int(os.environ.get("DATA_CACHE_MB", 1024))
 
-        # Pridobivanje cest (network_type="all" za detajle)
-        G = ox.graph_from_point((lat, lon), dist=razdalja, network_type="all", simplify=True, retain_all=True)
-        
-        # Pridobivanje vode
-        try:
-            water = ox.features_from_bbox(north, south, east, west, tags={
-                'natural': ['water', 'bay', 'strait'], 
-                'waterway': ['riverbank', 'dock', 'canal'],
-                'place': 'sea'
-            })
-        except:
-            water = None
-
-        # Barve in debeline cest
-        road_colors, road_widths = [], []
-        for u, v, k, data in G.edges(data=True, keys=True):
-            h_type = data.get("highway", "unclassified")
-            if isinstance(h_type, list): h_type = h_type[0]
-            if h_type in ["motorway", "trunk", "motorway_link", "trunk_link"]:
-                road_colors.append(barve["ac"]); road_widths.append(3.5)
-            else:
-                road_colors.append(barve["glavne"]); road_widths.append(0.7)
-
-        # Izris A4 formata
-        fig, ax = plt.subplots(figsize=(8.27, 11.69), facecolor=barve["bg"])
-        ax.set_facecolor(barve["bg"])
-        
-        if water is not None and not water.empty:
-            water.plot(ax=ax, color=barve["water"], edgecolor='none')
-        
-        ox.plot_graph(G, ax=ax, node_size=0, edge_color=road_colors, 
-                      edge_linewidth=road_widths, show=False, close=False)
-        
-        ax.set_ylim(south, north)
-        ax.set_xlim(west, east)
-        ax.axis('off')
-        
-        plt.subplots_adjust(bottom=0.22)
-        
-        # Napisi: Ime, Država in Koordinate
-        fig.text(0.5, 0.11, mesto.upper(), fontsize=32, color=barve["text"], ha="center", fontweight='bold')
-        fig.text(0.5, 0.08, drzava.upper(), fontsize=14, color=barve["text"], ha="center", alpha=0.7)
-        
-        koord_tekst = f"{abs(lat):.4f}° {'N' if lat>0 else 'S'} / {abs(lon):.4f}° {'E' if lon>0 else 'W'}"
-        fig.text(0.5, 0.05, koord_tekst, fontsize=9, color=barve["text"], ha="center", family="monospace", alpha=0.5)
 
-        # Shranjevanje v PNG buffer (za predogled)
-        buf_png = io.BytesIO()
-        fig.savefig(buf_png, format="png", facecolor=barve["bg"], dpi=200, bbox_inches='tight', pad_inches=0.4)
-        buf_png.seek(0)
+@st.cache_resource
+def podatkovni_sloj():
+    """Skupni predpomnilnik prizorov z omejitvijo pomnilnika."""
+    return SceneCache(max_entries=64, max_bytes=DATA_CACHE_MB * 1024**2)
+
+
+@st.cache_resource
+def koordinate_sloj():
+    """Skupni predpomnilnik koordinat; enaka mesta se geokodirajo enkrat."""
+    return SceneCache(max_entries=1000)
+
+
+def pridobi_koordinate(mesto, drzava):
+    return koordinate_sloj().get_or_create(place_key(mesto, drzava), lambda: get_coordinates(mesto, drzava))
+
+
+def nalozi_prizor(tocka, razdalja):
+    """
+    Ceste in voda v razdalji od točke, projicirane v UTM (ceste kot
+    zapakirani sloj, gl. get_road_layer), in meje izreza.
+    """
+    # Seje tečejo v svojih nitih; knjižnice naj se uvozijo enkrat, pod ključavnico
+    import_geo_stack()
+    ceste = get_road_layer(tocka, razdalja)
+    if ceste is None:
+        raise RuntimeError("Cestnega omrežja ni bilo mogoče pridobiti.")
+    voda = get_feature_layer(tocka, razdalja, VODA_TAGS, "water")
+    xlim, ylim = get_crop_limits(ceste["crs"], tocka, (A4[0], A4[1] * (1 - MAP_BOTTOM)), razdalja)
+    return {"ceste": ceste, "voda": voda, "xlim": xlim, "ylim": ylim}
+
+
+def pridobi_prizor(tocka, razdalja):
+    return podatkovni_sloj().get_or_create((tocka, razdalja), lambda: nalozi_prizor(tocka, razdalja))
+
+
+def izrisi_poster(mesto, drzava, razdalja, ime_teme, predogled=False):
+    """
+    Izriše A4 poster iz skupnega podatkovnega sloja. Predogled riše samo
+    glavne ceste in poenostavljeno vodo za ločljivost PREVIEW_DPI.
+    """
+    import numpy as np
+    from matplotlib.collections import LineCollection
+    from matplotlib.figure import Figure
+
+    # Pridobivanje koordinat (lokalni gazetteer, nato Nominatim)
+    lat, lon = pridobi_koordinate(mesto, drzava)
+    barve = TEME[ime_teme]
+
+    # Ceste (network_type="all" za detajle) in voda iz skupnega podatkovnega sloja
+    prizor = pridobi_prizor((lat, lon), razdalja)
+    ceste, voda = prizor["ceste"], prizor["voda"]
+    if predogled:
+        toleranca = get_simplify_tolerance(prizor["xlim"], A4[0], PREVIEW_DPI)
+        glavne = np.flatnonzero(ceste["classes"] <= ROAD_CLASSES.index(PREVIEW_ROAD_CLASSES[-1]))
+        ceste = simplify_road_layer(subset_road_layer(ceste, glavne), toleranca)
+        voda = simplify_polygons(voda, toleranca)
+
+    # Barve in debeline cest
+    razredi = ceste["classes"]
+    road_colors = lookup_by_road_class(razredi, {"motorway": barve["ac"], "trunk": barve["ac"]}, default=barve["glavne"])
+    road_widths = lookup_by_road_class(razredi, {"motorway": 3.5, "trunk": 3.5}, default=0.7)
+
+    # Izris A4 formata; Figure brez pyplot, da so hkratni izrisi varni
+    fig = Figure(figsize=A4, facecolor=barve["bg"])
+    ax = fig.add_axes((0, MAP_BOTTOM, 1, 1 - MAP_BOTTOM))
+    ax.set_facecolor(barve["bg"])
+
+    if voda is not None:
+        draw_polygon_layer(ax, voda, barve["water"], zorder=1)
 
-        # Shranjevanje v SVG buffer (za vektorski prenos)
-        buf_svg = io.BytesIO()
-        fig.savefig(buf_svg, format="svg", bbox_inches='tight', pad_inches=0.4)
-        buf_svg.seek(0)
+    ax.add_collection(LineCollection(np.split(ceste["coords"], ceste["offsets"][1:-1]), colors=road_colors,
+                                     linewidths=road_widths.astype(float), zorder=2), autolim=False)
 
-        plt.close(fig) # Sprostitev RAM-a
-        return buf_png.getvalue(), buf_svg.getvalue()
+    ax.set_xlim(prizor["xlim"])
+    ax.set_ylim(prizor["ylim"])
+    ax.set_aspect('equal', adjustable='box')
+    ax.axis('off')
+
+    # Napisi: Ime, Država in Koordinate
+    fig.text(0.5, 0.11, mesto.upper(), fontsize=32, color=barve["text"], ha="center", fontweight='bold')
+    fig.text(0.5, 0.08, drzava.upper(), fontsize=14, color=barve["text"], ha="center", alpha=0.7)
+    
+    koord_tekst = f"{abs(lat):.4f}° {'N' if lat>0 else 'S'} / {abs(lon):.4f}° {'E' if lon>0 else 'W'}"
+    fig.text(0.5, 0.05, koord_tekst, fontsize=9, color=barve["text"], ha="center", family="monospace", alpha=0.5)
+    return fig, barve
+
+
+# Hiter predogled v nizki ločljivosti, takoj ko so podatki na voljo
+@st.cache_data(show_spinner="Pripravljam predogled...", max_entries=50)
+def ustvari_predogled(mesto, drzava, razdalja, ime_teme):
+    try:
+        fig, barve = izrisi_poster(mesto, drzava, razdalja, ime_teme, predogled=True)
+        return export_poster(fig, ["png"], barve, dpi=PREVIEW_DPI, layout="tight", pad_inches=0.4)["png"]
+    except Exception:
+        # Napako pokaže polni izris
+        return None
+
+
+# Izrisani posterji (shrani zadnjih 20 iskanj)
+@st.cache_data(show_spinner="Ustvarjam vaš A4 poster (PNG + SVG)...", max_entries=20)
+def ustvari_poster_final(mesto, drzava, razdalja, ime_teme):
+    try:
+        fig, barve = izrisi_poster(mesto, drzava, razdalja, ime_teme)
+        # PNG (predogled) in SVG (vektorski prenos) iz iste izrisane slike
+        izvoz = export_poster(fig, ["png", "svg"], barve, dpi=200, layout="tight", pad_inches=0.4)
+        return izvoz["png"], izvoz["svg"]
     except Exception as e:
         return str(e), None
 
@@ -103,10 +160,15 @@ with col2:
     tema_vnos = st.selectbox("Slog", list(TEME.keys()))
 
 if st.button("✨ GENERIRAJ MOJSTROVINO"):
+    # Najprej hiter predogled, ki ga polna kakovost nato zamenja
+    slika = st.empty()
+    predogled = ustvari_predogled(mesto_vnos, drzava_vnos, zoom_vnos, tema_vnos)
+    if predogled is not None:
+        slika.image(predogled, caption="Predogled – izrisujem polno kakovost...", use_container_width=True)
     png_data, svg_data = ustvari_poster_final(mesto_vnos, drzava_vnos, zoom_vnos, tema_vnos)
     
     if svg_data:
-        st.image(png_data, use_container_width=True)
+        slika.image(png_data, use_container_width=True)
         
         c1, c2 = st.columns(2)
         with c1:
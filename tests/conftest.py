@@ -0,0 +1,47 @@
+"""
+Shared test setup. Tests run offline: map data comes from the tiny OSM
+extract in fixtures/ or a local stand-in server, and the cache lives in a
+temporary directory.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+TINY_OSM = FIXTURES / "tiny.osm"
+# Centre of the street grid in tiny.osm
+TINY_POINT = (46.05, 14.50)
+
+sys.path.insert(0, str(ROOT))
+# create_map_poster opens its cache on import
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="map_poster_tests_"))
+
+
+@pytest.fixture
+def cmp(tmp_path, monkeypatch):
+    """
+    create_map_poster with an empty cache and the default data source.
+    """
+    import create_map_poster
+    from poster_cache import DiskCache
+    monkeypatch.setattr(create_map_poster, "CACHE", DiskCache(tmp_path / "cache"))
+    monkeypatch.setattr(create_map_poster, "OSM_EXTRACT", None)
+    monkeypatch.delenv("OSM_EXTRACT", raising=False)
+    monkeypatch.setattr(create_map_poster, "_DATA_SOURCE", None)
+    monkeypatch.setattr(create_map_poster, "_GEOCODER", None)
+    return create_map_poster
+
+
+def run_python(code, tmp_path, **env):
+    """
+    Runs code in a fresh interpreter from the repository root, so lazy
+    imports happen the way they do in a real run. Returns the result.
+    """
+    import subprocess
+    environment = dict(os.environ, CACHE_DIR=str(tmp_path / "cache"), **env)
+    return subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=environment,
+                          capture_output=True, text=True, timeout=300)
@@ -0,0 +1,31 @@
+"""
+fetch_scene_data() against the tiny local extract, no network.
+"""
+from conftest import TINY_OSM, TINY_POINT, run_python
+
+
+def test_fetch_scene_data_in_fresh_interpreter(tmp_path):
+    # The geo stack is imported lazily; the first imports must not race
+    # inside the fetch thread pool, so this has to start cold
+    code = f"""
+import sys
+import create_map_poster as cmp
+assert "osmnx" not in sys.modules and "geopandas" not in sys.modules
+cmp.use_osm_extract({str(TINY_OSM)!r})
+roads, water, parks = cmp.fetch_scene_data({TINY_POINT!r}, 400)
+print("layers", len(roads["classes"]), len(water), len(parks))
+"""
+    for _ in range(3):
+        result = run_python(code, tmp_path)
+        assert result.returncode == 0, result.stderr
+        assert "layers" in result.stdout
+
+
+def test_fetch_scene_data_layers(cmp):
+    cmp.use_osm_extract(TINY_OSM)
+    roads, water, parks = cmp.fetch_scene_data(TINY_POINT, 400)
+    assert roads["crs"] == cmp.get_utm_crs(TINY_POINT)
+    assert len(roads["offsets"]) == len(roads["classes"]) + 1
+    # The pond and the multipolygon relation; the park
+    assert len(water) == 2
+    assert len(parks) == 1
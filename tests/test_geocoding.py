@@ -0,0 +1,109 @@
+"""
+The gazetteer layers in front of the geocoder, with a stub geocoder.
+"""
+import pytest
+
+import geocoding
+from geocoding import Geocoder, place_key
+from poster_cache import DiskCache
+
+
+class StubGeocoder:
+    """
+    Geocoder callable answering from a {query: (lat, lon)} table and
+    recording every query it was asked.
+    """
+
+    def __init__(self, places=None):
+        self.places = places or {}
+        self.queries = []
+
+    def __call__(self, query):
+        self.queries.append(query)
+        point = self.places.get(query)
+        return (*point, query) if point else None
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(geocoding.time, "time", lambda: now[0])
+    return now
+
+
+def test_seed_hit_never_geocodes():
+    stub = StubGeocoder()
+    geocoder = Geocoder(stub, seed={place_key("Ljubljana", "Slovenia"): (46.05, 14.51)})
+    assert geocoder.resolve("Ljubljana", "Slovenia") == (46.05, 14.51)
+    assert stub.queries == []
+
+
+def test_seed_file(tmp_path):
+    seed = tmp_path / "gazetteer.csv"
+    seed.write_text("city,country,lat,lon\nSão Paulo,Brazil,-23.55,-46.63\n", encoding="utf-8")
+    stub = StubGeocoder()
+    assert Geocoder(stub, seed=str(seed)).resolve("Sao Paulo", "Brasil") == (-23.55, -46.63)
+    assert stub.queries == []
+
+
+@pytest.mark.parametrize("city, country", [
+    ("São Paulo", "Brazil"),
+    ("sao paulo", "BRAZIL"),
+    ("  SÃO-PAULO ", "brasil"),
+    ("São Paulo, Brazil", None),
+    ("Sao Paulo, Brazil", "Brazil"),
+])
+def test_spellings_share_a_key(city, country):
+    assert place_key(city, country) == "sao-paulo_brazil"
+
+
+def test_spellings_geocode_once(tmp_path):
+    stub = StubGeocoder({"New York, USA": (40.71, -74.01)})
+    geocoder = Geocoder(stub, cache=DiskCache(tmp_path / "cache"))
+    assert geocoder.resolve("New York", "USA") == (40.71, -74.01)
+    assert geocoder.resolve("NEW  YORK", "united states") == (40.71, -74.01)
+    # Found places persist across processes
+    assert Geocoder(stub, cache=DiskCache(tmp_path / "cache")).resolve("new york", "US") == (40.71, -74.01)
+    assert stub.queries == ["New York, USA"]
+
+
+def test_miss_is_cached(tmp_path, clock):
+    stub = StubGeocoder()
+    geocoder = Geocoder(stub, cache=DiskCache(tmp_path / "cache"))
+    with pytest.raises(ValueError, match="Could not find"):
+        geocoder.resolve("Atlantis", "Greece")
+    with pytest.raises(ValueError, match="not found"):
+        geocoder.resolve("atlantis", "GREECE")
+    # The miss is in the persistent gazetteer too
+    with pytest.raises(ValueError, match="not found"):
+        Geocoder(stub, cache=DiskCache(tmp_path / "cache")).resolve("Atlantis", "Greece")
+    assert stub.queries == ["Atlantis, Greece"]
+
+
+def test_miss_expires(tmp_path, clock):
+    stub = StubGeocoder()
+    geocoder = Geocoder(stub, cache=DiskCache(tmp_path / "cache"), negative_ttl=60)
+    with pytest.raises(ValueError):
+        geocoder.resolve("Atlantis", "Greece")
+
+    clock[0] += 30
+    with pytest.raises(ValueError, match="not found"):
+        geocoder.resolve("Atlantis", "Greece")
+    assert len(stub.queries) == 1
+
+    # Past the TTL the geocoder is asked again, and this time it knows the place
+    clock[0] += 31
+    stub.places["Atlantis, Greece"] = (37.0, 25.0)
+    assert geocoder.resolve("Atlantis", "Greece") == (37.0, 25.0)
+    assert stub.queries == ["Atlantis, Greece", "Atlantis, Greece"]
+    assert geocoder.lookup("Atlantis", "Greece") == (37.0, 25.0)
+
+
+def test_service_errors_are_not_cached():
+    def failing(query):
+        raise TimeoutError("timed out")
+
+    geocoder = Geocoder(failing)
+    with pytest.raises(ValueError, match="Geocoding failed"):
+        geocoder.resolve("Ljubljana", "Slovenia")
+    assert geocoder.lookup("Ljubljana", "Slovenia") is None
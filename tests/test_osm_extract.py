@@ -0,0 +1,54 @@
+"""
+Reading map data from a local OSM extract, with no network.
+"""
+import os
+import subprocess
+import sys
+
+from conftest import FIXTURES, ROOT, TINY_OSM, TINY_POINT
+
+
+def test_relations_without_ways(tmp_path):
+    from data_sources import parse_osm_xml
+    path = tmp_path / "relations.osm"
+    path.write_text(
+        '<osm version="0.6">\n'
+        '  <relation id="1"><member type="way" ref="7" role="outer"/>'
+        '<tag k="type" v="multipolygon"/><tag k="natural" v="water"/></relation>\n'
+        '</osm>\n'
+    )
+    extract = parse_osm_xml(str(path))
+    assert len(extract.way_ids) == 0
+    response = extract.features_response((47, 46, 15, 14), {"natural": "water"})
+    assert response["elements"] == []
+
+
+def test_extract_queries(cmp):
+    from data_sources import LocalExtractSource
+    source = LocalExtractSource(str(TINY_OSM))
+    lat, lon = TINY_POINT
+    bbox = (lat + 0.01, lat - 0.01, lon + 0.01, lon - 0.01)
+    G = source.graph_from_bbox(bbox)
+    assert G.number_of_edges() > 0
+    water = source.features_from_bbox(bbox, cmp.WATER_TAGS)
+    # The tagged pond and the multipolygon built from an untagged way
+    assert sorted(water.index.get_level_values(0)) == ["relation", "way"]
+
+
+def test_cli_renders_from_extract(tmp_path):
+    # Themes and fonts are read relative to the working directory
+    for name in ("themes", "fonts"):
+        (tmp_path / name).symlink_to(ROOT / name)
+    env = dict(os.environ, CACHE_DIR=str(tmp_path / "cache"), GAZETTEER_SEED=str(FIXTURES / "gazetteer.csv"))
+    env.pop("OSM_EXTRACT", None)
+    result = subprocess.run(
+        [sys.executable, str(ROOT / "create_map_poster.py"), "--city", "Tiny Town", "--country", "Testland",
+         "--distance", "1000", "--width", "3", "--height", "4", "--dpi", "72", "--osm-file", str(TINY_OSM),
+         "--format", "png", "svg"],
+        cwd=tmp_path, env=env, capture_output=True, text=True, timeout=300,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+    posters = sorted(path.suffix for path in (tmp_path / "posters").iterdir())
+    assert posters == [".png", ".svg"]
+    # Nothing was fetched from the network
+    assert "Indexed" in result.stdout
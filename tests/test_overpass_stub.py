@@ -0,0 +1,162 @@
+"""
+The network fetch path against a local stand-in for Overpass and
+Nominatim (OVERPASS_URL / NOMINATIM_URL), serving the tiny extract.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from conftest import TINY_OSM, TINY_POINT
+
+# How long the stand-in takes per Overpass query, long enough to see overlap
+QUERY_SECONDS = 1.0
+
+# Overpass /status text: the fifth line reports free slots
+STATUS = "Connected as: 1\nCurrent time: now\nAnnounced endpoint: none\nRate limit: 0\n3 slots available now.\n"
+
+
+def query_layer(query):
+    if '["highway"]' in query:
+        return "roads"
+    if "leisure" in query:
+        return "parks"
+    return "water"
+
+
+class StandIn:
+    """
+    Overpass and Nominatim stand-in. Records every query with its start
+    and end time; layers in fail answer with HTTP 500.
+    """
+
+    def __init__(self):
+        from data_sources import parse_osm_xml
+        self.extract = parse_osm_xml(str(TINY_OSM))
+        self.queries = []
+        self.geocodes = []
+        self.fail = set()
+        self._lock = threading.Lock()
+
+    def overpass(self, query):
+        layer = query_layer(query)
+        started = time.perf_counter()
+        time.sleep(QUERY_SECONDS)
+        with self._lock:
+            self.queries.append((layer, started, time.perf_counter()))
+        if layer in self.fail:
+            return 500, "Internal error"
+        # Everything in the extract; osmnx clips to the requested area and tags
+        everywhere = (90, -90, 180, -180)
+        if layer == "roads":
+            response = self.extract.network_response(everywhere)
+        else:
+            response = self.extract.features_response(everywhere, {"natural": True, "waterway": True, "leisure": True, "landuse": True})
+        return 200, json.dumps(response)
+
+    def nominatim(self, params):
+        self.geocodes.append(params["q"][0])
+        lat, lon = TINY_POINT
+        return 200, json.dumps([{"lat": str(lat), "lon": str(lon), "display_name": "Tiny Town, Testland"}])
+
+
+@pytest.fixture
+def stand_in(cmp, monkeypatch):
+    import osmnx as ox
+    from create_map_poster import RateLimiter
+    server_state = StandIn()
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, body, content_type="application/json"):
+            data = body.encode()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path.endswith("/status"):
+                self._send(200, STATUS, "text/plain")
+            elif url.path.endswith("/search"):
+                self._send(*server_state.nominatim(parse_qs(url.query)))
+            else:
+                self._send(404, "{}")
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            query = parse_qs(self.rfile.read(length).decode())["data"][0]
+            status, body = server_state.overpass(query)
+            self._send(status, body, "application/json" if status == 200 else "text/plain")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr(cmp, "OVERPASS_URL", f"{url}/api")
+    monkeypatch.setattr(cmp, "NOMINATIM_URL", url)
+    # Fresh token buckets, so earlier tests do not delay these requests
+    monkeypatch.setattr(cmp, "OVERPASS_LIMITER", RateLimiter(rate=2.0, capacity=3))
+    monkeypatch.setattr(cmp, "NOMINATIM_LIMITER", RateLimiter(rate=1.0))
+    monkeypatch.setattr(ox.settings, "use_cache", False)
+    monkeypatch.setattr(ox.settings, "overpass_endpoint", ox.settings.overpass_endpoint)
+    monkeypatch.setattr(ox.settings, "nominatim_endpoint", ox.settings.nominatim_endpoint)
+    yield server_state
+    server.shutdown()
+    server.server_close()
+
+
+def test_layers_are_fetched_concurrently(cmp, stand_in):
+    started = time.perf_counter()
+    roads, water, parks = cmp.fetch_scene_data(TINY_POINT, 400)
+    elapsed = time.perf_counter() - started
+
+    assert sorted(layer for layer, _, _ in stand_in.queries) == ["parks", "roads", "water"]
+    # All three queries were in flight at the same time
+    assert max(start for _, start, _ in stand_in.queries) < min(end for _, _, end in stand_in.queries)
+    assert elapsed < 3 * QUERY_SECONDS
+    assert len(roads["classes"]) > 0
+    assert len(water) == 2 and len(parks) == 1
+
+
+def test_failed_feature_layer_leaves_the_others(cmp, stand_in):
+    stand_in.fail = {"parks"}
+    roads, water, parks = cmp.fetch_scene_data(TINY_POINT, 400)
+    assert parks is None
+    assert len(roads["classes"]) > 0 and len(water) == 2
+
+    # Failures are not cached: the next render asks again and succeeds
+    stand_in.fail = set()
+    _, _, parks = cmp.fetch_scene_data(TINY_POINT, 400)
+    assert len(parks) == 1
+
+
+def test_failed_street_network_raises(cmp, stand_in):
+    stand_in.fail = {"roads"}
+    with pytest.raises(RuntimeError, match="street network"):
+        cmp.fetch_scene_data(TINY_POINT, 400)
+
+
+def test_geocoding_uses_the_stand_in_once(cmp, stand_in, monkeypatch):
+    monkeypatch.setattr(cmp, "GAZETTEER_SEED", None)
+    assert cmp.get_coordinates("Tiny Town", "Testland") == TINY_POINT
+    assert cmp.get_coordinates("tiny town", "TESTLAND") == TINY_POINT
+    assert stand_in.geocodes == ["Tiny Town, Testland"]
+
+
+def test_osmnx_keeps_no_response_cache(cmp, stand_in, tmp_path, monkeypatch):
+    import osmnx as ox
+    # The osmnx defaults, pointed somewhere this test can look
+    monkeypatch.setattr(ox.settings, "use_cache", True)
+    monkeypatch.setattr(ox.settings, "cache_folder", str(tmp_path / "osmnx"))
+    cmp.fetch_scene_data(TINY_POINT, 400)
+    # Responses are only kept as tiles, inside the cache budget
+    assert not (tmp_path / "osmnx").exists()
+    assert cmp.CACHE.stats()["graphs"]["entries"] > 0
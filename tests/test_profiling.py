@@ -0,0 +1,75 @@
+"""
+Stage instrumentation while several threads export at once.
+"""
+import io
+import threading
+
+import profiling
+
+THREADS = 4
+EXPORTS = 5
+
+
+def make_figure():
+    import numpy as np
+    from matplotlib.collections import LineCollection
+    from matplotlib.figure import Figure
+
+    from create_map_poster import tag_layer
+
+    fig = Figure(figsize=(2, 2))
+    ax = fig.add_subplot()
+    tag_layer(ax.add_collection(LineCollection([[(0, 0), (1, 1)], [(0, 1), (1, 0)]])), "roads")
+    tag_layer(ax.scatter([0.2, 0.8], [0.5, 0.5]), "water")
+    tag_layer(ax.imshow(np.zeros((4, 4)), extent=(0, 1, 0, 1)), "gradients")
+    tag_layer(ax.text(0.5, 0.5, "Tiny Town"), "text")
+    return fig
+
+
+def test_concurrent_exports_leave_the_classes_alone():
+    from matplotlib.collections import LineCollection, PathCollection
+    from matplotlib.image import AxesImage
+    from matplotlib.text import Text
+
+    from create_map_poster import get_draw_stages
+
+    classes = (LineCollection, PathCollection, AxesImage, Text)
+    originals = {cls: cls.draw for cls in classes}
+    records = []
+    lock = threading.Lock()
+
+    def hook(record):
+        with lock:
+            records.append((record["thread"], record["name"]))
+
+    barrier = threading.Barrier(THREADS)
+    errors = []
+
+    def export():
+        try:
+            figures = [make_figure() for _ in range(EXPORTS)]
+            barrier.wait()
+            for fig in figures:
+                with profiling.trace_draw(get_draw_stages(fig)):
+                    fig.savefig(io.BytesIO(), format="png", dpi=20)
+        except Exception as e:
+            errors.append(e)
+
+    profiling.add_hook(hook)
+    try:
+        threads = [threading.Thread(target=export) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        profiling.remove_hook(hook)
+
+    assert errors == []
+    assert LineCollection.draw is originals[LineCollection]
+    assert all(cls.draw is original for cls, original in originals.items())
+    assert not any(profiling._draw_users.values()) and profiling._traced == {}
+    # Every layer of every export was timed exactly once, on its own thread
+    for thread in threads:
+        names = sorted(name for ident, name in records if ident == thread.ident)
+        assert names == sorted(["draw.roads", "draw.water", "draw.gradients", "draw.text"] * EXPORTS)
@@ -0,0 +1,85 @@
+"""
+Render service jobs, rendered from the tiny extract.
+"""
+import time
+
+import pytest
+
+from conftest import FIXTURES, TINY_OSM
+
+
+@pytest.fixture
+def service(cmp, monkeypatch):
+    from render_service import RenderService
+    monkeypatch.setattr(cmp, "OSM_EXTRACT", str(TINY_OSM))
+    monkeypatch.setattr(cmp, "GAZETTEER_SEED", str(FIXTURES / "gazetteer.csv"))
+    # Places outside the seed list are not found, without asking Nominatim
+    monkeypatch.setattr(cmp, "nominatim_geocode", lambda query: None)
+    service = RenderService(workers=2)
+    yield service
+    service.pool.shutdown(wait=True)
+
+
+def wait(service, job_id, seen):
+    """Polls a job until it finishes, recording every status it passes through."""
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        job = service.get(job_id)
+        seen.append(job)
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.005)
+    raise TimeoutError(job_id)
+
+
+def test_finished_jobs_are_published_whole(service):
+    request = {"city": "Tiny Town", "country": "Testland", "distance": 1000, "width": 3, "height": 4, "dpi": 72}
+    jobs = [service.submit(request) for _ in range(2)]
+    jobs.append(service.submit(dict(request, city="Atlantis")))
+    assert all(job["status"] == "queued" for job in jobs)
+
+    seen = []
+    done, again, missing = (wait(service, job["id"], seen) for job in jobs)
+    assert done["status"] == again["status"] == "done"
+    assert done["result"].startswith(b"\x89PNG")
+    assert missing["status"] == "failed" and "Atlantis" in missing["error"]
+    # A poller never sees a finished status without the fields that go with it
+    for job in seen:
+        if job["status"] == "done":
+            assert {"result", "seconds", "scene_seconds"} <= job.keys()
+        elif job["status"] == "failed":
+            assert {"error", "seconds"} <= job.keys()
+        else:
+            assert "seconds" not in job
+    assert service.health()["scenes"]["misses"] == 1
+
+
+@pytest.mark.parametrize("body, error", [
+    (b"[1]", "JSON object"),
+    (b'"Tiny Town"', "JSON object"),
+    (b"{", "Expecting"),
+    (b'{"city": "Tiny Town", "country": "Testland", "width": 0}', "width must be positive"),
+    (b'{"city": "Tiny Town", "country": "Testland", "height": -4}', "height must be positive"),
+    (b'{"city": "Tiny Town", "country": "Testland", "dpi": 0}', "dpi must be positive"),
+])
+def test_bad_requests_get_400(service, body, error):
+    import json
+    import threading
+    import urllib.error
+    import urllib.request
+    from http.server import ThreadingHTTPServer
+
+    from render_service import make_handler
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(service))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        request = urllib.request.Request(f"http://127.0.0.1:{server.server_address[1]}/jobs", data=body, method="POST")
+        with pytest.raises(urllib.error.HTTPError) as e:
+            urllib.request.urlopen(request, timeout=10)
+        assert e.value.code == 400
+        assert error in json.loads(e.value.read())["error"]
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert service.health()["jobs"] == {}
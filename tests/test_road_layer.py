@@ -0,0 +1,47 @@
+"""
+Packing of the road layer.
+"""
+import numpy as np
+
+from conftest import TINY_OSM, TINY_POINT
+
+
+def test_same_geometry_edges_are_drawn_once(cmp, monkeypatch):
+    # use_osm_extract() exports the extract; undone after the test
+    monkeypatch.setenv("OSM_EXTRACT", str(TINY_OSM))
+    cmp.use_osm_extract(TINY_OSM)
+    G = cmp.fetch_graph(TINY_POINT, 400)
+    roads = cmp.pack_road_layer(G, cmp.get_utm_crs(TINY_POINT))
+    # Every street is two-way, so each one is stored in both directions
+    assert len(roads["classes"]) == G.number_of_edges() // 2
+    # Minor roads first, so major roads draw on top
+    assert np.all(np.diff(roads["classes"]) <= 0)
+
+
+def test_dedupe_keeps_the_highest_class():
+    import shapely
+    import create_map_poster as cmp
+    line = shapely.LineString([(0, 0), (1, 0), (1, 1)])
+    geometries = np.array([line, shapely.reverse(line), shapely.LineString([(5, 5), (6, 6)])], dtype=object)
+    classes = np.array([5, 2, 5], dtype=np.int8)
+    assert cmp.dedupe_geometries(geometries, classes).tolist() == [1, 2]
+
+
+def test_cached_bases_expire_with_the_road_layer(cmp, monkeypatch):
+    monkeypatch.setenv("OSM_EXTRACT", str(TINY_OSM))
+    cmp.use_osm_extract(TINY_OSM)
+    theme = cmp.load_theme("feature_based")
+    built = []
+
+    def base():
+        return cmp.get_base_layer(TINY_POINT, 400, 3, 4, 72, theme, raster=True, on_scene=built.append)
+
+    stored = base()
+    assert len(built) == 1
+    assert base() == stored and len(built) == 1
+
+    # A base stored under the previous road layer version is not served
+    monkeypatch.setattr(cmp, "ROAD_LAYER_VERSION", cmp.ROAD_LAYER_VERSION + 1)
+    base()
+    assert len(built) == 2
+    assert base() is not None and len(built) == 2
@@ -0,0 +1,28 @@
+"""
+Cache warming from a city list, against the tiny extract.
+"""
+import json
+
+from conftest import FIXTURES, TINY_OSM
+
+
+def test_spelling_variants_are_warmed_once(cmp, tmp_path, monkeypatch, capsys):
+    import warm_cache
+    # use_osm_extract() exports the extract; undone after the test
+    monkeypatch.setenv("OSM_EXTRACT", str(TINY_OSM))
+    monkeypatch.setattr(cmp, "GAZETTEER_SEED", str(FIXTURES / "gazetteer.csv"))
+    cities = tmp_path / "cities.txt"
+    cities.write_text("Tiny Town, Testland\ntiny town, TESTLAND\n  TINY-TOWN , testland\n")
+    state = tmp_path / "warm_state.json"
+    argv = [str(cities), "--distances", "400", "--sizes", "3x4", "--state", str(state), "--osm-file", str(TINY_OSM)]
+
+    assert warm_cache.main(argv) == 0
+    output = capsys.readouterr().out
+    assert "2 duplicate cities" in output
+    assert output.count("Warming ") == 1
+    assert list(json.loads(state.read_text())["cities"]) == ["tiny-town_testland"]
+
+    # A later run with another spelling finds the city warm
+    cities.write_text("TINY TOWN, testland\n")
+    assert warm_cache.main(argv) == 0
+    assert "already warm" in capsys.readouterr().out
@@ -0,0 +1,280 @@
+"""
+Strip-by-strip rasterization for large print posters.
+
+A 36x48 inch poster at 300 DPI is a 10800x14400 canvas, about 600 MB of
+RGBA in a single Agg buffer. Here the figure is instead rendered as
+horizontal strips, each one a savefig() cropped to its band of the
+figure, and every strip is compressed into the PNG as soon as it is
+drawn. Peak memory follows the strip size, not the poster size.
+
+Strips can be rendered by worker processes, each holding an unpickled
+copy of the figure.
+
+PNGs can also be kept as independently compressed blocks of rows (see
+encode_png_blocks), so a few rows can be changed and the file reassembled
+without compressing the rest again.
+"""
+import io
+import multiprocessing
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# PNG row filters: "Sub" subtracts the pixel to the left, "Up" the byte above
+PNG_FILTER_SUB = 1
+PNG_FILTER_UP = 2
+
+ADLER_BASE = 65521
+
+# Rows per independently compressed block of a cached base raster
+BASE_BLOCK_ROWS = 64
+
+
+def write_chunk(f, kind, data):
+    """
+    Writes one PNG chunk: length, type, data and CRC.
+    """
+    f.write(struct.pack(">I", len(data)))
+    f.write(kind)
+    f.write(data)
+    f.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(kind))))
+
+
+def png_header(width, height, dpi=None):
+    """
+    PNG signature, IHDR and optional pHYs chunk of an 8-bit RGBA image.
+    """
+    out = io.BytesIO()
+    out.write(PNG_SIGNATURE)
+    # Bit depth 8, color type 6 (RGBA), default compression, filter and interlace
+    write_chunk(out, b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+    if dpi:
+        pixels_per_meter = round(dpi / 0.0254)
+        write_chunk(out, b"pHYs", struct.pack(">IIB", pixels_per_meter, pixels_per_meter, 1))
+    return out.getvalue()
+
+
+class StreamingPNGWriter:
+    """
+    Writes an 8-bit RGBA PNG to a binary file-like object row block by
+    row block, so the full image is never held in memory.
+    """
+
+    def __init__(self, f, width, height, dpi=None, compression=6):
+        self.f = f
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self._compressor = zlib.compressobj(compression)
+        self._previous_row = None
+
+        self.f.write(png_header(width, height, dpi))
+
+    def write_rows(self, rows):
+        """
+        Appends a (n, width, 4) uint8 block of rows.
+        """
+        import numpy as np
+
+        rows = rows.reshape(len(rows), self.width * 4)
+        if self.rows_written + len(rows) > self.height:
+            raise ValueError("More rows than the PNG height")
+        previous = self._previous_row if self._previous_row is not None else np.zeros_like(rows[0])
+        above = np.vstack((previous[None, :], rows[:-1]))
+        filtered = np.empty((len(rows), self.width * 4 + 1), dtype=np.uint8)
+        filtered[:, 0] = PNG_FILTER_UP
+        np.subtract(rows, above, out=filtered[:, 1:])
+
+        data = self._compressor.compress(filtered.tobytes())
+        if data:
+            write_chunk(self.f, b"IDAT", data)
+        self._previous_row = rows[-1].copy()
+        self.rows_written += len(rows)
+
+    def close(self):
+        if self.rows_written != self.height:
+            raise ValueError(f"PNG has {self.rows_written} of {self.height} rows")
+        write_chunk(self.f, b"IDAT", self._compressor.flush())
+        write_chunk(self.f, b"IEND", b"")
+
+
+def adler32_combine(adler1, adler2, len2):
+    """
+    Adler-32 of two concatenated byte strings from their checksums, as
+    zlib's adler32_combine().
+    """
+    rem = len2 % ADLER_BASE
+    sum1 = adler1 & 0xFFFF
+    sum2 = (rem * sum1) % ADLER_BASE
+    sum1 += (adler2 & 0xFFFF) + ADLER_BASE - 1
+    sum2 += ((adler1 >> 16) & 0xFFFF) + ((adler2 >> 16) & 0xFFFF) + ADLER_BASE - rem
+    sum1 %= ADLER_BASE
+    sum2 %= ADLER_BASE
+    return sum1 | (sum2 << 16)
+
+
+def encode_png_block(rows, compression=6):
+    """
+    Filters and deflates a (n, width, 4) uint8 block of rows on its own:
+    the first row uses the Sub filter, so nothing refers to rows outside
+    the block. Returns (raw deflate data, adler32, uncompressed length).
+    """
+    import numpy as np
+
+    rows = rows.reshape(len(rows), -1)
+    filtered = np.empty((len(rows), rows.shape[1] + 1), dtype=np.uint8)
+    filtered[0, 0] = PNG_FILTER_SUB
+    filtered[0, 1:5] = rows[0, :4]
+    np.subtract(rows[0, 4:], rows[0, :-4], out=filtered[0, 5:])
+    filtered[1:, 0] = PNG_FILTER_UP
+    np.subtract(rows[1:], rows[:-1], out=filtered[1:, 1:])
+
+    data = filtered.tobytes()
+    compressor = zlib.compressobj(compression, zlib.DEFLATED, -15)
+    # A full flush ends the block byte-aligned, so blocks can be concatenated
+    deflated = compressor.compress(data) + compressor.flush(zlib.Z_FULL_FLUSH)
+    return deflated, zlib.adler32(data), len(data)
+
+
+def decode_png_block(block, width):
+    """
+    Inverse of encode_png_block(): returns the (n, width, 4) uint8 rows.
+    """
+    import numpy as np
+
+    data = zlib.decompressobj(-15).decompress(block[0])
+    filtered = np.frombuffer(data, dtype=np.uint8).reshape(-1, width * 4 + 1)[:, 1:]
+    rows = np.cumsum(filtered, axis=0, dtype=np.uint8)
+    # First row: undo Sub per channel; the Up sums below it then follow
+    first = np.cumsum(filtered[0].reshape(width, 4), axis=0, dtype=np.uint8).reshape(-1)
+    rows += (first - filtered[0])[None, :]
+    return rows.reshape(len(rows), width, 4)
+
+
+def encode_png_blocks(image, block_rows=64, compression=6):
+    """
+    Splits a (height, width, 4) uint8 image into independently compressed
+    blocks of block_rows rows, for assemble_png().
+    """
+    return [encode_png_block(image[top:top + block_rows], compression) for top in range(0, len(image), block_rows)]
+
+
+def assemble_png(width, height, blocks, dpi=None):
+    """
+    Joins blocks from encode_png_blocks() into a complete PNG file.
+    """
+    adler = 1
+    for _, block_adler, length in blocks:
+        adler = adler32_combine(adler, block_adler, length)
+    # zlib header, the blocks, an empty final deflate block, the checksum
+    stream = b"".join([b"\x78\x9c", *(block[0] for block in blocks), b"\x03\x00", struct.pack(">I", adler)])
+
+    out = io.BytesIO()
+    out.write(png_header(width, height, dpi))
+    write_chunk(out, b"IDAT", stream)
+    write_chunk(out, b"IEND", b"")
+    return out.getvalue()
+
+
+def canvas_size(fig, dpi):
+    """
+    Pixel size of the figure when saved without cropping.
+    """
+    width, height = fig.get_size_inches()
+    return round(width * dpi), round(height * dpi)
+
+
+def render_strip(fig, top, rows, dpi, facecolor):
+    """
+    Renders rows [top, top + rows) of the figure (counted from the top)
+    and returns them as a (rows, width, 4) uint8 array.
+    """
+    import numpy as np
+    from matplotlib.transforms import Bbox
+
+    width, height = canvas_size(fig, dpi)
+    bottom = height - top - rows
+    # Figure coordinates are inches from the bottom left
+    band = Bbox([[0, bottom / dpi], [width / dpi, (height - top) / dpi]])
+
+    # Images are resampled to their whole clip box, by default the axes, so
+    # every strip would pay for the full gradients: clip them to the strip
+    strip_box = Bbox([[0, 0], [width, rows]])
+    clip_boxes = {}
+    for ax in fig.axes:
+        ax.apply_aspect()
+        x0, y0, x1, y1 = ax.get_position().extents
+        ax_box = Bbox([[x0 * width, y0 * height - bottom], [x1 * width, y1 * height - bottom]])
+        for image in ax.images:
+            if image.get_clip_on():
+                clip_boxes[image] = image.get_clip_box()
+                # An empty intersection still needs a box, just a degenerate one
+                image.set_clip_box(Bbox.intersection(ax_box, strip_box) or Bbox([[0, 0], [0, 0]]))
+
+    buffer = io.BytesIO()
+    try:
+        fig.savefig(buffer, format="rgba", dpi=dpi, facecolor=facecolor, bbox_inches=band, pad_inches=0)
+    finally:
+        for image, clip_box in clip_boxes.items():
+            image.set_clip_box(clip_box)
+    return np.frombuffer(buffer.getbuffer(), dtype=np.uint8).reshape(rows, width, 4)
+
+
+_WORKER_FIGURE = None
+
+
+def _init_strip_worker(fig_bytes):
+    global _WORKER_FIGURE
+    import pickle
+    _WORKER_FIGURE = pickle.loads(fig_bytes)
+
+
+def _render_worker_strip(top, rows, dpi, facecolor):
+    return render_strip(_WORKER_FIGURE, top, rows, dpi, facecolor)
+
+
+def write_png_strips(fig, output, dpi, facecolor, strip_rows=1024, workers=1):
+    """
+    Saves the figure as a PNG to a path or binary file-like object,
+    rendering strip_rows rows at a time. With workers > 1 the strips are
+    rendered in that many processes from a pickled copy of the figure;
+    only a few strips per worker are in flight at once.
+    """
+    width, height = canvas_size(fig, dpi)
+    strips = [(top, min(strip_rows, height - top)) for top in range(0, height, strip_rows)]
+
+    if isinstance(output, (str, bytes)) or hasattr(output, "__fspath__"):
+        with open(output, "wb") as f:
+            return write_png_strips(fig, f, dpi, facecolor, strip_rows, workers)
+
+    writer = StreamingPNGWriter(output, width, height, dpi=dpi)
+    if workers <= 1:
+        for top, rows in strips:
+            writer.write_rows(render_strip(fig, top, rows, dpi, facecolor))
+    else:
+        import pickle
+        # spawn: fetch threads may be running, which fork does not copy safely
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_strip_worker,
+            initargs=(pickle.dumps(fig),),
+        ) as pool:
+            pending = deque()
+            queued = iter(strips)
+
+            def submit_next():
+                strip = next(queued, None)
+                if strip is not None:
+                    pending.append(pool.submit(_render_worker_strip, *strip, dpi, facecolor))
+
+            for _ in range(2 * workers):
+                submit_next()
+            # Strips are written in order; finished ones wait in pending
+            while pending:
+                writer.write_rows(pending.popleft().result())
+                submit_next()
+    writer.close()
@@ -0,0 +1,226 @@
+"""
+Cache warmer.
+
+Geocodes a list of cities and fetches their street networks, water and
+parks ahead of time, so the first poster of each city only renders. Road
+layers are stored projected and packed, ready to draw. Cities are warmed
+one after another under the shared Overpass/Nominatim rate limits, and
+progress is saved to a state file so an interrupted run resumes where it
+stopped.
+
+Usage:
+  python warm_cache.py cities.txt [--distances 10000 medium] [--sizes poster 3.6x3.6]
+  python create_map_poster.py warm cities.txt ...
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import create_map_poster as cmp
+from geocoding import place_key
+
+# Named radii, after the distance guide in the README
+DISTANCE_PRESETS = {"small": 5000, "medium": 10000, "large": 18000}
+
+# Named poster sizes in inches, after the resolution guide in the README
+SIZE_PRESETS = {
+    "poster": (12.0, 16.0),
+    "instagram": (3.6, 3.6),
+    "mobile": (3.6, 6.4),
+    "hd": (6.4, 3.6),
+    "4k": (12.8, 7.2),
+    "a4": (8.267, 11.694),
+}
+
+
+def load_city_list(path):
+    """
+    Reads (city, country) pairs from a text file with one "City, Country"
+    per line, or from a CSV/JSON/YAML manifest with city and country columns.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".csv", ".json", ".yaml", ".yml"):
+        from batch_posters import load_manifest
+        return [(job["city"], job["country"]) for job in load_manifest(path)]
+
+    cities = []
+    with open(path, "r") as f:
+        for number, line in enumerate(f, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            city, sep, country = line.rpartition(",")
+            if not sep or not city.strip() or not country.strip():
+                raise ValueError(f"Line {number}: expected 'City, Country', got '{line}'")
+            cities.append((city.strip(), country.strip()))
+    return cities
+
+
+def parse_distance(value):
+    """A preset name or a radius in meters."""
+    if value.lower() in DISTANCE_PRESETS:
+        return DISTANCE_PRESETS[value.lower()]
+    try:
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' is not a distance preset ({', '.join(DISTANCE_PRESETS)}) or meters")
+
+
+def parse_size(value):
+    """A preset name or WIDTHxHEIGHT in inches."""
+    if value.lower() in SIZE_PRESETS:
+        return SIZE_PRESETS[value.lower()]
+    try:
+        width, height = (float(part) for part in value.lower().split("x"))
+        return width, height
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' is not a size preset ({', '.join(SIZE_PRESETS)}) or WxH")
+
+
+def fetch_radii(distances, sizes):
+    """
+    Fetch radii needed for every distance and size. Sizes with the same
+    aspect ratio share a radius, so each is only fetched once.
+    """
+    return sorted({cmp.get_compensated_dist(dist, width, height) for dist in distances for (width, height) in sizes})
+
+
+def city_key(city, country):
+    """State key of a city; spelling variants of one place share it."""
+    return place_key(city, country)
+
+
+def unique_cities(cities):
+    """Drops spelling variants of a city already in the list, keeping the first."""
+    unique = {}
+    for city, country in cities:
+        unique.setdefault(city_key(city, country), (city, country))
+    return list(unique.values())
+
+
+def load_state(path):
+    if not path or not os.path.exists(path):
+        return {"cities": {}}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_state(path, state):
+    """Writes the state file atomically, so an interrupted run never corrupts it."""
+    if not path:
+        return
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+def cache_bytes():
+    return sum(ns["bytes"] for ns in cmp.CACHE.stats().values())
+
+
+def warm_city(city, country, radii):
+    """
+    Geocodes a city and fetches its map data for every radius.
+    Returns a report with the time taken and the bytes added to the cache.
+    """
+    started = time.perf_counter()
+    bytes_before = cache_bytes()
+    point = cmp.get_coordinates(city, country)
+    for dist in radii:
+        cmp.fetch_scene_data(point, dist)
+    return {
+        "status": "done",
+        "point": list(point),
+        "radii": radii,
+        "seconds": round(time.perf_counter() - started, 3),
+        "bytes": max(0, cache_bytes() - bytes_before),
+    }
+
+
+def is_warm(entry, radii):
+    return entry is not None and entry.get("status") == "done" and set(radii) <= set(entry.get("radii", []))
+
+
+def warm_cities(cities, distances, sizes, state_path=None):
+    """
+    Warms the cache for every city and returns the state with one report
+    per city. Cities already warm for these radii in the state file are
+    skipped; failed ones are retried on the next run.
+    """
+    state = load_state(state_path)
+    radii = fetch_radii(distances, sizes)
+    for number, (city, country) in enumerate(cities, 1):
+        key = city_key(city, country)
+        if is_warm(state["cities"].get(key), radii):
+            print(f"✓ [{number}/{len(cities)}] {city}, {country}: already warm")
+            continue
+
+        print(f"\n[{number}/{len(cities)}] Warming {city}, {country} ({len(radii)} radii)")
+        try:
+            report = warm_city(city, country, radii)
+        except Exception as e:
+            print(f"✗ {city}, {country}: {e}")
+            report = {"status": "failed", "error": str(e)}
+        state["cities"][key] = dict(report, city=city, country=country)
+        save_state(state_path, state)
+    return state
+
+
+def print_report(cities, state):
+    print("\n" + "=" * 60)
+    print(f"  {'City':<30} {'Status':<8} {'Time':>8} {'Cache':>10}")
+    print("-" * 60)
+    total_seconds = total_bytes = 0
+    for city, country in cities:
+        entry = state["cities"].get(city_key(city, country), {})
+        seconds, size = entry.get("seconds", 0), entry.get("bytes", 0)
+        total_seconds += seconds
+        total_bytes += size
+        print(f"  {f'{city}, {country}'[:30]:<30} {entry.get('status', '-'):<8} {seconds:>7.1f}s {size / 1024**2:>8.1f} MB")
+    print("-" * 60)
+    print(f"  {'Total':<30} {'':<8} {total_seconds:>7.1f}s {total_bytes / 1024**2:>8.1f} MB")
+    print("=" * 60)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-populate the cache for a list of cities")
+    parser.add_argument("cities", help="Text file with one 'City, Country' per line, or a CSV/JSON/YAML manifest")
+    parser.add_argument("--distances", "-d", nargs="+", type=parse_distance, default=[29000],
+                        help=f"Map radii in meters or presets ({', '.join(DISTANCE_PRESETS)}) (default: 29000)")
+    parser.add_argument("--sizes", "-s", nargs="+", type=parse_size, default=[SIZE_PRESETS["poster"]],
+                        help=f"Poster sizes as WxH inches or presets ({', '.join(SIZE_PRESETS)}) (default: poster)")
+    parser.add_argument("--state", default="warm_state.json", help="Progress file used to resume (default: warm_state.json)")
+    parser.add_argument("--restart", action="store_true", help="Ignore the progress file and warm every city again")
+    parser.add_argument("--rate", type=float, help=f"Overpass requests per second (default: {cmp.OVERPASS_LIMITER.rate:g})")
+    parser.add_argument("--osm-file", help="Read map data from a local OSM extract instead of Overpass")
+    args = parser.parse_args(argv)
+
+    try:
+        cities = load_city_list(args.cities)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+    listed, cities = len(cities), unique_cities(cities)
+    if len(cities) < listed:
+        print(f"⚠ {listed - len(cities)} duplicate cities in the list, warmed once")
+    if args.osm_file:
+        if not os.path.exists(args.osm_file):
+            print(f"Error: OSM extract '{args.osm_file}' not found.")
+            return 1
+        cmp.use_osm_extract(args.osm_file)
+    if args.rate:
+        cmp.OVERPASS_LIMITER.rate = args.rate
+    if args.restart and os.path.exists(args.state):
+        os.remove(args.state)
+
+    state = warm_cities(cities, args.distances, args.sizes, args.state)
+    print_report(cities, state)
+    failed = sum(1 for city, country in cities if state["cities"].get(city_key(city, country), {}).get("status") != "done")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())